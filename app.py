@@ -1,51 +1,140 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, make_response
 from flask_sqlalchemy import SQLAlchemy
+from flask_caching import Cache
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import or_
-from datetime import datetime, timedelta
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from sqlalchemy import or_, case, event, false, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.orm import Session, aliased, contains_eager, defer, joinedload, object_session, raiseload
+from datetime import date, datetime, timedelta
+from functools import lru_cache, wraps
 from werkzeug.utils import secure_filename
 import os
+import hashlib
+import logging
 import secrets
+import uuid
+import sqlite3
 import re
-from collections import defaultdict
 from dotenv import load_dotenv
+from jinja2 import FileSystemBytecodeCache
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
 
+# Diagnostics such as the per-upload processing details are logged at DEBUG level
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'WARNING').upper(),
+                    format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
 # Security Configuration
 SECRET_KEY = os.getenv('SECRET_KEY')
 if not SECRET_KEY:
     SECRET_KEY = secrets.token_hex(32)
-    print("⚠️  WARNING: Using generated SECRET_KEY. Set SECRET_KEY in .env file for production!")
+    app.logger.warning("⚠️ Using generated SECRET_KEY. Set SECRET_KEY in .env file for production!")
 
 app.config['SECRET_KEY'] = SECRET_KEY
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///fleet_management.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('FLEET_DATABASE_URI', 'sqlite:///fleet_management.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'poolclass': QueuePool,
+    'pool_size': 10,
+    'max_overflow': 20,
+    'pool_pre_ping': True,
+    'pool_recycle': 1800,
+    'connect_args': {
+        'check_same_thread': False,  # Pooled connections are shared across worker threads
+        'timeout': 30  # Wait for a concurrent writer's lock instead of failing with "database is locked"
+    }
+}
 app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 10MB max file size
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'uploads')
 
+# Server-side cache for computed page data and large per-user payloads, shared between workers
+app.config['CACHE_TYPE'] = os.getenv('CACHE_TYPE', 'FileSystemCache')
+app.config['CACHE_DIR'] = os.getenv('CACHE_DIR', os.path.join(app.instance_path, 'cache'))
+app.config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL')  # Used when CACHE_TYPE=RedisCache
+app.config['CACHE_DEFAULT_TIMEOUT'] = 60
+app.config['CACHE_THRESHOLD'] = int(os.getenv('CACHE_THRESHOLD', 500))  # Files kept before expired, then oldest, entries are pruned
+
 # Session Security
 app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production with HTTPS
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=30)
 
-# Login attempt tracking (in-memory - use Redis in production)
-login_attempts = defaultdict(lambda: {'count': 0, 'locked_until': None})
+# Failed login attempts are counted in their own shared cache, so every worker sees the same counts.
+# On FileSystemCache it is a separate directory, so page data or import payloads never push a lock out;
+# over the threshold cachelib sweeps expired entries first, so live locks are only evicted by more
+# distinct failures than this in one window. On RedisCache the caches share one database and only
+# their key prefixes differ, so eviction depends on the server's maxmemory policy (see .env.example).
+# Account locks are kept on the User row regardless.
+LOGIN_ATTEMPT_WINDOW = 15 * 60  # Seconds a failure counts against the limit, and length of the lock
+LOGIN_CACHE_THRESHOLD = 10000
+
 
 
+# Rows per page on the vehicle and maintenance lists
+PER_PAGE = 50
 
 # Allowed file extensions
-ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg'}
+ALLOWED_EXTENSIONS = frozenset({'pdf', 'png', 'jpg', 'jpeg'})
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    _, dot, ext = filename.rpartition('.')
+    return bool(dot) and ext.lower() in ALLOWED_EXTENSIONS
 
 db = SQLAlchemy(app)
+cache = Cache(app)
+# Week-long AI parse results and login rate-limit state each get their own cache
+# (own directory and threshold on FileSystemCache, own key prefix on RedisCache)
+doc_parse_cache = Cache(app, config={
+    'CACHE_DIR': os.path.join(app.instance_path, 'doc_parse_cache'),
+    'CACHE_THRESHOLD': 500,
+    'CACHE_KEY_PREFIX': 'docparse:',
+})
+login_cache = Cache(app, config={
+    'CACHE_DIR': os.path.join(app.instance_path, 'login_cache'),
+    'CACHE_KEY_PREFIX': 'login:',
+    'CACHE_THRESHOLD': LOGIN_CACHE_THRESHOLD,
+    'CACHE_DEFAULT_TIMEOUT': LOGIN_ATTEMPT_WINDOW,  # Backends without an atomic inc() re-set the counter with this
+})
+
+# Compiled templates are kept on disk so new worker processes skip re-parsing them
+jinja_cache_dir = os.path.join(app.instance_path, 'jinja_cache')
+os.makedirs(jinja_cache_dir, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(jinja_cache_dir)
+
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Enable WAL so readers don't block on a writer, and relax fsync to once per checkpoint"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA mmap_size=268435456')
+    cursor.close()
+
+# Flag lazy loads that fire once per row (N+1 queries) while developing
+if os.getenv('FLASK_DEBUG') == '1':
+    try:
+        from nplusone.ext.flask_sqlalchemy import NPlusOne
+        NPlusOne(app)
+    except ImportError:
+        pass
+
+def list_options(*options):
+    """Loader options for list views; in debug mode any relationship they don't load eagerly raises"""
+    if app.debug:
+        return (*options, raiseload('*'))
+    return options
 
 # Flask-Login setup
 login_manager = LoginManager()
@@ -57,6 +146,16 @@ login_manager.session_protection = 'strong'  # Protect against session hijacking
 
 
 # ===== USER MODEL =====
+
+# Argon2id is memory-hard, so it resists GPU cracking at a lower per-login CPU cost than PBKDF2
+password_hasher = PasswordHasher(time_cost=2, memory_cost=64 * 1024, parallelism=1)
+
+@lru_cache(maxsize=None)
+def dummy_password_hash():
+    """Hash verified against when the username doesn't exist, so a miss takes as long as a real password check"""
+    # Built on first use rather than at import: one Argon2 hash is most of the module's import time
+    return password_hasher.hash(secrets.token_hex(16))
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False, index=True)
@@ -70,40 +169,59 @@ class User(UserMixin, db.Model):
     last_login = db.Column(db.DateTime)
     last_login_ip = db.Column(db.String(45))  # Support IPv6
     
+    # Expression indexes so case-insensitive lookups hit an index
+    __table_args__ = (
+        db.Index('ix_user_username_lower', db.func.lower(username)),
+        db.Index('ix_user_email_lower', db.func.lower(email)),
+    )
+    
     def set_password(self, password):
-        """Hash and set password with pbkdf2:sha256"""
-        self.password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        """Hash and set password with Argon2id"""
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        """Verify password against hash"""
+        """Verify password against hash, upgrading outdated hashes after a successful check"""
         if not password or not self.password_hash:
             return False
-        return check_password_hash(self.password_hash, password)
+        
+        if self.password_hash.startswith('$argon2'):
+            try:
+                password_hasher.verify(self.password_hash, password)
+            except (VerificationError, InvalidHashError):
+                return False
+            if password_hasher.check_needs_rehash(self.password_hash):
+                self.set_password(password)
+            return True
+        
+        # Legacy Werkzeug pbkdf2 hash - rehash with Argon2id (saved by the caller's commit)
+        if check_password_hash(self.password_hash, password):
+            self.set_password(password)
+            return True
+        return False
     
-    def is_account_locked(self):
-        """Check if account is currently locked"""
-        if self.locked_until and datetime.utcnow() < self.locked_until:
+    # The lockout helpers only change fields; the login route commits them with the rest of the attempt
+    def is_account_locked(self, now):
+        """Check if account is currently locked at now (naive UTC)"""
+        if not self.locked_until:
+            return False
+        if now < self.locked_until:
             return True
-        elif self.locked_until and datetime.utcnow() >= self.locked_until:
-            # Unlock account if lock period has expired
-            self.locked_until = None
-            self.failed_login_attempts = 0
-            db.session.commit()
+        # Unlock account if lock period has expired
+        self.locked_until = None
+        self.failed_login_attempts = 0
         return False
     
-    def record_failed_login(self):
-        """Record failed login attempt and lock account if threshold exceeded"""
+    def record_failed_login(self, now):
+        """Record failed login attempt at now and lock account if threshold exceeded"""
         self.failed_login_attempts += 1
         if self.failed_login_attempts >= 5:
             # Lock account for 15 minutes after 5 failed attempts
-            self.locked_until = datetime.utcnow() + timedelta(minutes=15)
-        db.session.commit()
+            self.locked_until = now + timedelta(minutes=15)
     
     def reset_failed_logins(self):
         """Reset failed login counter on successful login"""
         self.failed_login_attempts = 0
         self.locked_until = None
-        db.session.commit()
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -134,8 +252,15 @@ class Vehicle(db.Model):
     status = db.Column(db.String(20), default='Active')  # Active, In Maintenance, Retired
     assigned_driver = db.Column(db.String(100))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    maintenance_records = db.relationship('MaintenanceRecord', backref='vehicle', lazy=True, cascade='all, delete-orphan',
+                                          order_by='(MaintenanceRecord.service_date.desc(), MaintenanceRecord.id.desc())')
     
-    maintenance_records = db.relationship('MaintenanceRecord', backref='vehicle', lazy=True, cascade='all, delete-orphan')
+    __table_args__ = (
+        db.Index('ix_vehicle_status', 'status'),
+        db.Index('ix_vehicle_updated_at', 'updated_at'),
+    )
     
     def __repr__(self):
         return f'<Vehicle {self.make} {self.model} - {self.license_plate}>'
@@ -153,18 +278,199 @@ class MaintenanceRecord(db.Model):
     next_service_due = db.Column(db.Date)
     next_service_mileage = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_maint_next_due', 'next_service_due'),
+        db.Index('ix_maint_service_date', 'service_date'),
+        db.Index('ix_maint_vehicle_date', 'vehicle_id', 'service_date'),
+        db.Index('ix_maint_type', 'maintenance_type'),
+        db.Index('ix_maint_updated_at', 'updated_at'),
+        db.Index('ix_maint_created_at', 'created_at'),
+    )
     
     def __repr__(self):
         return f'<MaintenanceRecord {self.maintenance_type} - {self.service_date}>'
 
 
+class FleetVersion(db.Model):
+    """Single row counting committed vehicle and maintenance changes, used to version cached pages"""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+@event.listens_for(FleetVersion.__table__, 'after_create')
+def fleet_version_table_created(target, connection, **kw):
+    connection.execute(target.insert().values(id=1, version=0))
+
+
+# ===== VEHICLE SEARCH INDEX =====
+
+# Trigram FTS5 index over the searchable vehicle columns, kept in sync by triggers.
+# Trigrams keep the substring semantics of the old LIKE '%q%' search, but use the index.
+VEHICLE_SEARCH_COLUMNS = ('vin', 'make', 'model', 'license_plate')
+
+def create_vehicle_search_index(connection):
+    """Create (or rebuild) the vehicle_fts table and its sync triggers"""
+    columns = ', '.join(VEHICLE_SEARCH_COLUMNS)
+    new_values = ', '.join(f'new.{c}' for c in VEHICLE_SEARCH_COLUMNS)
+    old_values = ', '.join(f'old.{c}' for c in VEHICLE_SEARCH_COLUMNS)
+    for statement in (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS vehicle_fts USING fts5({columns}, content='vehicle', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS vehicle_fts_ai AFTER INSERT ON vehicle BEGIN "
+        f"INSERT INTO vehicle_fts(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS vehicle_fts_ad AFTER DELETE ON vehicle BEGIN "
+        f"INSERT INTO vehicle_fts(vehicle_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS vehicle_fts_au AFTER UPDATE ON vehicle BEGIN "
+        f"INSERT INTO vehicle_fts(vehicle_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO vehicle_fts(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        "INSERT INTO vehicle_fts(vehicle_fts) VALUES ('rebuild')",
+    ):
+        connection.exec_driver_sql(statement)
+    app.extensions['vehicle_search'] = True
+
+@event.listens_for(Vehicle.__table__, 'after_create')
+def vehicle_table_created(target, connection, **kw):
+    if connection.dialect.name != 'sqlite':
+        return
+    try:
+        create_vehicle_search_index(connection)
+    except Exception as e:
+        # Older SQLite builds without FTS5/trigram support fall back to LIKE searches
+        app.logger.warning("⚠️ Vehicle search index not created: %s", e)
+
+@event.listens_for(Vehicle.__table__, 'before_drop')
+def vehicle_table_dropped(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql("DROP TABLE IF EXISTS vehicle_fts")
+        app.extensions['vehicle_search'] = False
+
+def vehicle_search_available():
+    """True if the vehicle_fts table exists, checked once per process and kept current by the listeners above"""
+    if 'vehicle_search' not in app.extensions:
+        app.extensions['vehicle_search'] = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'vehicle_fts'")
+        ).first() is not None
+    return app.extensions['vehicle_search']
+
+def vehicle_search_filter(search_query, columns=VEHICLE_SEARCH_COLUMNS):
+    """Filter for vehicles with search_query in any of the given columns"""
+    # Trigrams need at least 3 characters; shorter searches use LIKE
+    if len(search_query) >= 3 and vehicle_search_available():
+        phrase = '"' + search_query.replace('"', '""') + '"'
+        match = '{' + ' '.join(columns) + '} : ' + phrase
+        return Vehicle.id.in_(
+            text("SELECT rowid FROM vehicle_fts WHERE vehicle_fts MATCH :match").bindparams(match=match).columns(Vehicle.id)
+        )
+    return or_(*(getattr(Vehicle, c).contains(search_query) for c in columns))
+
+
+# ===== FLEET CHANGE TRACKING =====
+
+# Writes to these tables bump the fleet version, and committing one clears the cached dashboard stats
+FLEET_MODELS = (Vehicle, MaintenanceRecord)
+
+def mark_fleet_changed(session, connection):
+    """Bump the fleet version once in each transaction that writes vehicle or maintenance data"""
+    if session.info.get('fleet_changed'):
+        return
+    session.info['fleet_changed'] = True
+    # Same connection and transaction as the write, so a rollback undoes the bump too
+    version = FleetVersion.__table__.c.version
+    connection.execute(FleetVersion.__table__.update().values(version=version + 1))
+
+def fleet_row_changed(mapper, connection, target):
+    mark_fleet_changed(object_session(target), connection)
+
+for model in FLEET_MODELS:
+    for event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(model, event_name, fleet_row_changed)
+
+@event.listens_for(Session, 'do_orm_execute')
+def fleet_statement_executed(orm_execute_state):
+    """Catch bulk insert()/update()/delete() statements, which skip the per-row mapper events"""
+    state = orm_execute_state
+    if (state.is_insert or state.is_update or state.is_delete) and state.bind_mapper \
+            and state.bind_mapper.class_ in FLEET_MODELS:
+        mark_fleet_changed(state.session, state.session.connection())
+
+@event.listens_for(Session, 'after_commit')
+def fleet_changes_committed(session):
+    if session.info.pop('fleet_changed', False):
+        cache.delete('dashboard_stats')
+
+@event.listens_for(Session, 'after_rollback')
+def fleet_changes_rolled_back(session):
+    session.info.pop('fleet_changed', None)
+
+
+# ===== FLEET DATA VERSION =====
+
+def fleet_version():
+    """Token that changes whenever a vehicle or maintenance record is added, edited or deleted"""
+    # One primary-key read of the counter row kept by mark_fleet_changed()
+    return db.session.query(FleetVersion.version).filter_by(id=1).scalar()
+
+def build_id():
+    """Newest modification time of the app code and templates, read once at startup"""
+    template_dir = os.path.join(app.root_path, app.template_folder)
+    paths = [__file__] + [os.path.join(root, name) for root, _, names in os.walk(template_dir) for name in names]
+    return str(max(os.path.getmtime(path) for path in paths))
+
+# Part of every ETag, so a deploy that changes templates or views never answers 304 with the old page
+APP_BUILD = os.getenv('APP_BUILD') or build_id()
+
+def fleet_etag(view):
+    """Answer 304 without running the view when the fleet data behind the page is unchanged"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Pending flash messages change the page, so render those normally
+        if session.get('_flashes'):
+            return view(*args, **kwargs)
+        
+        etag = hashlib.sha1(
+            f'{APP_BUILD}|{fleet_version()}|{current_user.username}|{date.today()}|{request.full_path}'.encode()
+        ).hexdigest()
+        if etag in request.if_none_match:
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+        response.set_etag(etag)
+        return response
+    return wrapper
+
+
+# ===== SERVER-SIDE SESSION PAYLOADS =====
+
+def stash_payload(name, payload, timeout=600):
+    """Keep a payload in the cache and only its key in the session cookie"""
+    key = f'{name}:{uuid.uuid4().hex}'
+    cache.set(key, payload, timeout=timeout)
+    session[name] = key
+
+def pop_payload(name):
+    """Remove and return a payload stored with stash_payload (None if missing or expired)"""
+    key = session.pop(name, None)
+    if key is None:
+        return None
+    payload = cache.get(key)
+    cache.delete(key)
+    return payload
+
+
 # ===== SECURITY UTILITIES =====
 
+USERNAME_RE = re.compile(r'^[a-zA-Z0-9_-]+$')
+EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+UPPERCASE_RE = re.compile(r'[A-Z]')
+LOWERCASE_RE = re.compile(r'[a-z]')
+DIGIT_RE = re.compile(r'[0-9]')
+
 def validate_username(username):
     """Validate username format"""
     if not username or len(username) < 3 or len(username) > 80:
         return False, "Username must be between 3 and 80 characters"
-    if not re.match(r'^[a-zA-Z0-9_-]+$', username):
+    if not USERNAME_RE.match(username):
         return False, "Username can only contain letters, numbers, hyphens, and underscores"
     return True, None
 
@@ -172,8 +478,7 @@ def validate_email(email):
     """Validate email format"""
     if not email or len(email) > 120:
         return False, "Invalid email address"
-    email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    if not re.match(email_pattern, email):
+    if not EMAIL_RE.match(email):
         return False, "Invalid email format"
     return True, None
 
@@ -185,11 +490,11 @@ def validate_password(password):
         return False, "Password must be at least 8 characters long"
     if len(password) > 128:
         return False, "Password must be less than 128 characters"
-    if not re.search(r'[A-Z]', password):
+    if not UPPERCASE_RE.search(password):
         return False, "Password must contain at least one uppercase letter"
-    if not re.search(r'[a-z]', password):
+    if not LOWERCASE_RE.search(password):
         return False, "Password must contain at least one lowercase letter"
-    if not re.search(r'[0-9]', password):
+    if not DIGIT_RE.search(password):
         return False, "Password must contain at least one number"
     return True, None
 
@@ -199,36 +504,50 @@ def get_client_ip():
         return request.headers.get('X-Forwarded-For').split(',')[0].strip()
     return request.remote_addr or 'unknown'
 
-def is_rate_limited(identifier):
-    """Check if IP/user is rate limited"""
-    attempt_data = login_attempts[identifier]
-    
-    # Check if locked
-    if attempt_data['locked_until'] and datetime.utcnow() < attempt_data['locked_until']:
-        remaining = (attempt_data['locked_until'] - datetime.utcnow()).total_seconds()
-        return True, int(remaining / 60) + 1  # Minutes remaining
+def is_rate_limited(identifier, now):
+    """Check if IP/user is rate limited at now"""
+    locked_until = login_cache.get(f'login_lock:{identifier}')
     
-    # Reset if lock expired
-    if attempt_data['locked_until'] and datetime.utcnow() >= attempt_data['locked_until']:
-        login_attempts[identifier] = {'count': 0, 'locked_until': None}
+    # The lock entry expires with the lock, so only a live lock is found here
+    if locked_until:
+        remaining = (locked_until - now).total_seconds()
+        if remaining > 0:
+            return True, int(remaining / 60) + 1  # Minutes remaining
     
     return False, 0
 
-def record_failed_attempt(identifier):
-    """Record failed login attempt and apply rate limiting"""
-    login_attempts[identifier]['count'] += 1
+def record_failed_attempt(identifier, now):
+    """Record failed login attempt at now and apply rate limiting"""
+    count_key = f'login_attempts:{identifier}'
+    # add() only creates the counter (with its expiry) if missing; inc() is an atomic INCR on RedisCache
+    login_cache.add(count_key, 0, timeout=LOGIN_ATTEMPT_WINDOW)
+    count = login_cache.cache.inc(count_key) or 0
     
     # Lock after 5 failed attempts
-    if login_attempts[identifier]['count'] >= 5:
-        login_attempts[identifier]['locked_until'] = datetime.utcnow() + timedelta(minutes=15)
+    if count >= 5:
+        locked_until = now + timedelta(seconds=LOGIN_ATTEMPT_WINDOW)
+        login_cache.set(f'login_lock:{identifier}', locked_until, timeout=LOGIN_ATTEMPT_WINDOW)
         return 15  # Locked for 15 minutes
     
     return 0
 
 def reset_attempts(identifier):
     """Reset login attempts on successful login"""
-    if identifier in login_attempts:
-        login_attempts[identifier] = {'count': 0, 'locked_until': None}
+    login_cache.delete_many(f'login_attempts:{identifier}', f'login_lock:{identifier}')
+
+
+# ===== RESPONSE CACHING =====
+
+@app.after_request
+def add_conditional_caching(response):
+    """Let browsers revalidate unchanged pages with an ETag instead of downloading them again"""
+    if request.method == 'GET' and response.status_code in (200, 304) and response.mimetype == 'text/html':
+        # Pages are per-user, so only the browser may store them and it must always revalidate
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.add_etag()
+        response.make_conditional(request)
+    return response
 
 
 # ===== AUTHENTICATION ROUTES =====
@@ -246,8 +565,9 @@ def login():
         password = request.form.get('password', '')
         remember = request.form.get('remember') == 'on'
         
-        # Get client IP for rate limiting
+        # Get client IP for rate limiting, and read the clock once for every lockout check below
         client_ip = get_client_ip()
+        now = datetime.utcnow()
         
         # Input validation
         if not username or not password:
@@ -261,13 +581,13 @@ def login():
             return render_template('login.html')
         
         # Check rate limiting by IP
-        is_limited, minutes_remaining = is_rate_limited(client_ip)
+        is_limited, minutes_remaining = is_rate_limited(client_ip, now)
         if is_limited:
             flash(f'Too many failed login attempts. Please try again in {minutes_remaining} minute(s).', 'danger')
             return render_template('login.html'), 429
         
-        # Query user (use case-insensitive search)
-        user = User.query.filter(User.username.ilike(username)).first()
+        # Query user (case-insensitive, served by ix_user_username_lower)
+        user = User.query.filter(db.func.lower(User.username) == username.lower()).first()
         
         if user:
             # Check if account is active
@@ -276,8 +596,8 @@ def login():
                 return render_template('login.html')
             
             # Check if account is locked
-            if user.is_account_locked():
-                minutes_left = int((user.locked_until - datetime.utcnow()).total_seconds() / 60) + 1
+            if user.is_account_locked(now):
+                minutes_left = int((user.locked_until - now).total_seconds() / 60) + 1
                 flash(f'Account is temporarily locked due to multiple failed login attempts. Try again in {minutes_left} minute(s).', 'danger')
                 return render_template('login.html')
             
@@ -287,7 +607,7 @@ def login():
                 login_user(user, remember=remember, duration=timedelta(days=30))
                 
                 # Update user record
-                user.last_login = datetime.utcnow()
+                user.last_login = now
                 user.last_login_ip = client_ip
                 user.reset_failed_logins()
                 db.session.commit()
@@ -309,9 +629,10 @@ def login():
                 return redirect(url_for('dashboard'))
             else:
                 # Failed password
-                user.record_failed_login()
-                minutes_locked = record_failed_attempt(client_ip)
-                record_failed_attempt(username.lower())
+                user.record_failed_login(now)
+                db.session.commit()
+                minutes_locked = record_failed_attempt(client_ip, now)
+                record_failed_attempt(username.lower(), now)
                 
                 if minutes_locked > 0:
                     flash(f'Too many failed attempts. Account locked for {minutes_locked} minutes.', 'danger')
@@ -322,8 +643,12 @@ def login():
                     else:
                         flash('Invalid username or password', 'danger')
         else:
-            # User not found - still record attempt to prevent username enumeration timing attacks
-            minutes_locked = record_failed_attempt(client_ip)
+            # User not found - still do the hashing work and record the attempt to prevent username enumeration
+            try:
+                password_hasher.verify(dummy_password_hash(), password)
+            except VerificationError:
+                pass
+            minutes_locked = record_failed_attempt(client_ip, now)
             if minutes_locked > 0:
                 flash(f'Too many failed attempts. Please try again in {minutes_locked} minutes.', 'danger')
             else:
@@ -354,39 +679,41 @@ def profile():
                 flash('Current password is incorrect.', 'danger')
                 return redirect(url_for('profile'))
             
-            updated = False
+            change_username = bool(new_username) and new_username != current_user.username
+            change_email = bool(new_email) and new_email != current_user.email
             
-            # Username update
-            if new_username and new_username != current_user.username:
+            if change_username:
                 is_valid, error_msg = validate_username(new_username)
                 if not is_valid:
                     flash(error_msg, 'danger')
                     return redirect(url_for('profile'))
-                
-                # Check if username is taken
-                existing_user = User.query.filter(User.username.ilike(new_username)).first()
-                if existing_user and existing_user.id != current_user.id:
-                    flash('Username already taken.', 'danger')
-                    return redirect(url_for('profile'))
-                
-                current_user.username = new_username
-                updated = True
             
-            # Email update
-            if new_email and new_email != current_user.email:
+            if change_email:
                 is_valid, error_msg = validate_email(new_email)
                 if not is_valid:
                     flash(error_msg, 'danger')
                     return redirect(url_for('profile'))
+            
+            # Check both new values against other accounts in a single query
+            if change_username or change_email:
+                username_match = db.func.lower(User.username) == new_username.lower() if change_username else false()
+                email_match = db.func.lower(User.email) == new_email.lower() if change_email else false()
+                conflicts = db.session.query(username_match, email_match).filter(
+                    or_(username_match, email_match), User.id != current_user.id
+                ).all()
                 
-                # Check if email is taken
-                existing_user = User.query.filter(User.email.ilike(new_email)).first()
-                if existing_user and existing_user.id != current_user.id:
+                if any(username_conflict for username_conflict, _ in conflicts):
+                    flash('Username already taken.', 'danger')
+                    return redirect(url_for('profile'))
+                if any(email_conflict for _, email_conflict in conflicts):
                     flash('Email already in use.', 'danger')
                     return redirect(url_for('profile'))
-                
+            
+            if change_username:
+                current_user.username = new_username
+            if change_email:
                 current_user.email = new_email
-                updated = True
+            updated = change_username or change_email
             
             if updated:
                 db.session.commit()
@@ -459,68 +786,98 @@ def index():
     return redirect(url_for('dashboard'))
 
 
+@cache.cached(timeout=60, key_prefix='dashboard_stats')
+def get_dashboard_stats():
+    """Vehicle counts by status and month-to-date maintenance cost (cleared when fleet data is committed)"""
+    # Total maintenance cost this month
+    first_day_of_month = date.today().replace(day=1)
+    monthly_cost_subquery = db.session.query(db.func.sum(MaintenanceRecord.cost)).filter(
+        MaintenanceRecord.service_date >= first_day_of_month
+    ).scalar_subquery()
+    
+    # Vehicle counts by status and the monthly cost in a single round-trip
+    total_vehicles, active_vehicles, in_maintenance, monthly_cost = db.session.query(
+        db.func.count(Vehicle.id),
+        db.func.coalesce(db.func.sum(case((Vehicle.status == 'Active', 1), else_=0)), 0),
+        db.func.coalesce(db.func.sum(case((Vehicle.status == 'In Maintenance', 1), else_=0)), 0),
+        monthly_cost_subquery
+    ).one()
+    
+    return {
+        'total_vehicles': total_vehicles,
+        'active_vehicles': active_vehicles,
+        'in_maintenance': in_maintenance,
+        'monthly_cost': monthly_cost or 0
+    }
+
+
 @app.route('/dashboard')
 @login_required
+@fleet_etag
 def dashboard():
-    print(f"Dashboard access: is_authenticated={current_user.is_authenticated}, user={current_user.username if current_user.is_authenticated else 'None'}")
-    total_vehicles = Vehicle.query.count()
-    active_vehicles = Vehicle.query.filter_by(status='Active').count()
-    in_maintenance = Vehicle.query.filter_by(status='In Maintenance').count()
+    stats = get_dashboard_stats()
+    
+    # Both lists show the vehicle but not the notes
+    record_options = list_options(joinedload(MaintenanceRecord.vehicle), defer(MaintenanceRecord.notes))
     
     # Recent maintenance
-    recent_maintenance = MaintenanceRecord.query.order_by(MaintenanceRecord.service_date.desc()).limit(5).all()
+    recent_maintenance = MaintenanceRecord.query.options(*record_options).order_by(
+        MaintenanceRecord.service_date.desc()
+    ).limit(5).all()
     
     # Upcoming maintenance (within next 30 days)
-    thirty_days_from_now = datetime.now().date() + timedelta(days=30)
-    upcoming_maintenance = MaintenanceRecord.query.filter(
+    today = date.today()
+    thirty_days_from_now = today + timedelta(days=30)
+    upcoming_maintenance = MaintenanceRecord.query.options(*record_options).filter(
         MaintenanceRecord.next_service_due <= thirty_days_from_now,
-        MaintenanceRecord.next_service_due >= datetime.now().date()
+        MaintenanceRecord.next_service_due >= today
     ).order_by(MaintenanceRecord.next_service_due).all()
     
-    # Total maintenance cost this month
-    first_day_of_month = datetime.now().replace(day=1).date()
-    monthly_cost = db.session.query(db.func.sum(MaintenanceRecord.cost)).filter(
-        MaintenanceRecord.service_date >= first_day_of_month
-    ).scalar() or 0
-    
     return render_template('dashboard.html',
-                         total_vehicles=total_vehicles,
-                         active_vehicles=active_vehicles,
-                         in_maintenance=in_maintenance,
                          recent_maintenance=recent_maintenance,
                          upcoming_maintenance=upcoming_maintenance,
-                         monthly_cost=monthly_cost)
+                         **stats)
+
+
+def latest_maintenance_records(vehicle_ids):
+    """Most recent maintenance record of each given vehicle, in one windowed query (notes are not loaded)"""
+    ranked = db.session.query(
+        MaintenanceRecord,
+        db.func.row_number().over(
+            partition_by=MaintenanceRecord.vehicle_id,
+            order_by=(MaintenanceRecord.service_date.desc(), MaintenanceRecord.id.desc())
+        ).label('rank')
+    ).filter(MaintenanceRecord.vehicle_id.in_(list(vehicle_ids))).subquery()
+    latest = aliased(MaintenanceRecord, ranked)
+    return db.session.query(latest).options(defer(latest.notes)).filter(ranked.c.rank == 1).all()
 
 
 @app.route('/vehicles')
 @login_required
+@fleet_etag
 def vehicles():
     search_query = request.args.get('search', '')
     status_filter = request.args.get('status', '')
     
-    query = Vehicle.query
+    query = Vehicle.query.options(*list_options())
     
     if search_query:
-        query = query.filter(
-            (Vehicle.make.contains(search_query)) |
-            (Vehicle.model.contains(search_query)) |
-            (Vehicle.license_plate.contains(search_query)) |
-            (Vehicle.vin.contains(search_query))
-        )
+        query = query.filter(vehicle_search_filter(search_query))
     
     if status_filter:
         query = query.filter_by(status=status_filter)
     
-    vehicles_list = query.order_by(Vehicle.make, Vehicle.model).all()
+    # The id tiebreaker keeps page boundaries stable between requests
+    pagination = query.order_by(Vehicle.make, Vehicle.model, Vehicle.id).paginate(
+        page=request.args.get('page', 1, type=int), per_page=PER_PAGE, error_out=False
+    )
+    vehicles_list = pagination.items
     # Build a dict of vehicle_id -> latest maintenance record
-    latest_maintenance = {}
-    for vehicle in vehicles_list:
-        if vehicle.maintenance_records:
-            latest = sorted(vehicle.maintenance_records, key=lambda r: r.service_date, reverse=True)[0]
-            latest_maintenance[vehicle.id] = latest
-        else:
-            latest_maintenance[vehicle.id] = None
-    return render_template('vehicles.html', vehicles=vehicles_list, latest_maintenance=latest_maintenance, search_query=search_query, status_filter=status_filter)
+    latest_maintenance = dict.fromkeys((vehicle.id for vehicle in vehicles_list), None)
+    latest_maintenance.update(
+        (record.vehicle_id, record) for record in latest_maintenance_records(latest_maintenance)
+    )
+    return render_template('vehicles.html', vehicles=vehicles_list, pagination=pagination, latest_maintenance=latest_maintenance, search_query=search_query, status_filter=status_filter)
 
 
 @app.route('/vehicle/add', methods=['GET', 'POST'])
@@ -534,7 +891,7 @@ def add_vehicle():
                 model=request.form['model'],
                 year=int(request.form['year']),
                 license_plate=request.form['license_plate'],
-                purchase_date=datetime.strptime(request.form['purchase_date'], '%Y-%m-%d').date(),
+                purchase_date=date.fromisoformat(request.form['purchase_date']),
                 current_mileage=int(request.form['current_mileage']),
                 status=request.form['status'],
                 assigned_driver=request.form.get('assigned_driver', '')
@@ -553,7 +910,7 @@ def add_vehicle():
 @app.route('/vehicle/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
 def edit_vehicle(id):
-    vehicle = Vehicle.query.get_or_404(id)
+    vehicle = db.get_or_404(Vehicle, id, options=[raiseload(Vehicle.maintenance_records)])
     
     if request.method == 'POST':
         try:
@@ -562,7 +919,7 @@ def edit_vehicle(id):
             vehicle.model = request.form['model']
             vehicle.year = int(request.form['year'])
             vehicle.license_plate = request.form['license_plate']
-            vehicle.purchase_date = datetime.strptime(request.form['purchase_date'], '%Y-%m-%d').date()
+            vehicle.purchase_date = date.fromisoformat(request.form['purchase_date'])
             vehicle.current_mileage = int(request.form['current_mileage'])
             vehicle.status = request.form['status']
             vehicle.assigned_driver = request.form.get('assigned_driver', '')
@@ -579,31 +936,32 @@ def edit_vehicle(id):
 
 @app.route('/vehicle/<int:id>')
 @login_required
+@fleet_etag
 def vehicle_detail(id):
-    vehicle = Vehicle.query.get_or_404(id)
-    maintenance_records = MaintenanceRecord.query.filter_by(vehicle_id=id).order_by(MaintenanceRecord.service_date.desc()).all()
+    # Vehicle and its history in one joined query; the relationship returns newest first
+    vehicle = db.get_or_404(Vehicle, id, options=[joinedload(Vehicle.maintenance_records)])
+    maintenance_records = vehicle.maintenance_records
     
-    # Calculate total maintenance cost
-    total_cost = sum(record.cost for record in maintenance_records)
+    # The page lists every record anyway, so total them here instead of querying again
+    today = date.today()
+    total_cost = sum(record.cost or 0 for record in maintenance_records)
+    upcoming_count = sum(1 for record in maintenance_records
+                         if record.next_service_due and record.next_service_due >= today)
     
-    # Check for upcoming maintenance
-    upcoming = [record for record in maintenance_records if record.next_service_due and record.next_service_due >= datetime.now().date()]
-    
-    return render_template('vehicle_detail.html', vehicle=vehicle, maintenance_records=maintenance_records, total_cost=total_cost, upcoming=upcoming)
+    return render_template('vehicle_detail.html', vehicle=vehicle, maintenance_records=maintenance_records, total_cost=total_cost, upcoming_count=upcoming_count)
 
 
 @app.route('/vehicle/delete/<int:id>', methods=['POST'])
 @login_required
 def delete_vehicle(id):
-    vehicle = Vehicle.query.get_or_404(id)
+    vehicle = db.get_or_404(Vehicle, id)
     try:
-        # Store vehicle data in session for undo
-        session['pending_delete'] = {
+        # Store vehicle data for undo
+        stash_payload('pending_delete', {
             'type': 'vehicle',
             'id': id,
             'name': f'{vehicle.year} {vehicle.make} {vehicle.model}'
-        }
-        session.modified = True
+        })
         
         db.session.delete(vehicle)
         db.session.commit()
@@ -617,31 +975,32 @@ def delete_vehicle(id):
 
 @app.route('/maintenance')
 @login_required
+@fleet_etag
 def maintenance():
     search_query = request.args.get('search', '')
     type_filter = request.args.get('type', '')
     
-    query = MaintenanceRecord.query.join(Vehicle)
+    # The join is already needed for filtering, so populate record.vehicle from it
+    # instead of lazy-loading one vehicle per row in the template
+    query = MaintenanceRecord.query.join(Vehicle).options(*list_options(contains_eager(MaintenanceRecord.vehicle)))
     
     if search_query:
-        query = query.filter(
-            (Vehicle.make.contains(search_query)) |
-            (Vehicle.model.contains(search_query)) |
-            (Vehicle.license_plate.contains(search_query))
-        )
+        query = query.filter(vehicle_search_filter(search_query, ('make', 'model', 'license_plate')))
     
     if type_filter:
         query = query.filter(MaintenanceRecord.maintenance_type == type_filter)
     
-    maintenance_records = query.order_by(MaintenanceRecord.service_date.desc()).all()
+    pagination = query.order_by(MaintenanceRecord.service_date.desc(), MaintenanceRecord.id.desc()).paginate(
+        page=request.args.get('page', 1, type=int), per_page=PER_PAGE, error_out=False
+    )
     
-    return render_template('maintenance.html', maintenance_records=maintenance_records, search_query=search_query, type_filter=type_filter)
+    return render_template('maintenance.html', maintenance_records=pagination.items, pagination=pagination, search_query=search_query, type_filter=type_filter)
 
 
 @app.route('/maintenance/add/<int:vehicle_id>', methods=['GET', 'POST'])
 @login_required
 def add_maintenance(vehicle_id):
-    vehicle = Vehicle.query.get_or_404(vehicle_id)
+    vehicle = db.get_or_404(Vehicle, vehicle_id, options=[raiseload(Vehicle.maintenance_records)])
     
     if request.method == 'POST':
         try:
@@ -653,12 +1012,12 @@ def add_maintenance(vehicle_id):
             maintenance = MaintenanceRecord(
                 vehicle_id=vehicle_id,
                 maintenance_type=maintenance_type,
-                service_date=datetime.strptime(request.form['service_date'], '%Y-%m-%d').date(),
+                service_date=date.fromisoformat(request.form['service_date']),
                 mileage_at_service=int(request.form['mileage_at_service']),
                 cost=float(request.form['cost']),
                 service_provider=request.form.get('service_provider', ''),
                 notes=request.form.get('notes', ''),
-                next_service_due=datetime.strptime(request.form['next_service_due'], '%Y-%m-%d').date() if request.form.get('next_service_due') else None,
+                next_service_due=date.fromisoformat(request.form['next_service_due']) if request.form.get('next_service_due') else None,
                 next_service_mileage=int(request.form['next_service_mileage']) if request.form.get('next_service_mileage') else None
             )
             
@@ -680,7 +1039,7 @@ def add_maintenance(vehicle_id):
 @app.route('/maintenance/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
 def edit_maintenance(id):
-    maintenance = MaintenanceRecord.query.get_or_404(id)
+    maintenance = db.get_or_404(MaintenanceRecord, id, options=[joinedload(MaintenanceRecord.vehicle).raiseload(Vehicle.maintenance_records)])
     vehicle = maintenance.vehicle
     
     if request.method == 'POST':
@@ -691,12 +1050,12 @@ def edit_maintenance(id):
                 maintenance_type = request.form['custom_maintenance_type']
             
             maintenance.maintenance_type = maintenance_type
-            maintenance.service_date = datetime.strptime(request.form['service_date'], '%Y-%m-%d').date()
+            maintenance.service_date = date.fromisoformat(request.form['service_date'])
             maintenance.mileage_at_service = int(request.form['mileage_at_service'])
             maintenance.cost = float(request.form['cost'])
             maintenance.service_provider = request.form.get('service_provider', '')
             maintenance.notes = request.form.get('notes', '')
-            maintenance.next_service_due = datetime.strptime(request.form['next_service_due'], '%Y-%m-%d').date() if request.form.get('next_service_due') else None
+            maintenance.next_service_due = date.fromisoformat(request.form['next_service_due']) if request.form.get('next_service_due') else None
             maintenance.next_service_mileage = int(request.form['next_service_mileage']) if request.form.get('next_service_mileage') else None
             
             db.session.commit()
@@ -712,28 +1071,27 @@ def edit_maintenance(id):
 @app.route('/maintenance/delete/<int:id>', methods=['POST'])
 @login_required
 def delete_maintenance(id):
-    maintenance = MaintenanceRecord.query.get_or_404(id)
+    maintenance = db.get_or_404(MaintenanceRecord, id)
     vehicle_id = maintenance.vehicle_id
     
     try:
-        # Store maintenance data in session for undo
-        session['pending_delete'] = {
+        # Store maintenance data for undo (pickled by the cache, so dates need no conversion)
+        stash_payload('pending_delete', {
             'type': 'maintenance',
             'id': id,
             'vehicle_id': vehicle_id,
             'data': {
                 'vehicle_id': maintenance.vehicle_id,
                 'maintenance_type': maintenance.maintenance_type,
-                'service_date': maintenance.service_date.isoformat(),
+                'service_date': maintenance.service_date,
                 'mileage_at_service': maintenance.mileage_at_service,
                 'cost': maintenance.cost,
                 'service_provider': maintenance.service_provider,
                 'notes': maintenance.notes,
-                'next_service_due': maintenance.next_service_due.isoformat() if maintenance.next_service_due else None,
+                'next_service_due': maintenance.next_service_due,
                 'next_service_mileage': maintenance.next_service_mileage
             }
-        }
-        session.modified = True
+        })
         
         db.session.delete(maintenance)
         db.session.commit()
@@ -748,28 +1106,14 @@ def delete_maintenance(id):
 @app.route('/undo-delete', methods=['POST'])
 @login_required
 def undo_delete():
-    if 'pending_delete' not in session:
+    delete_info = pop_payload('pending_delete')
+    if delete_info is None:
         return jsonify({'success': False, 'message': 'Nothing to undo'})
     
-    delete_info = session.pop('pending_delete')
-    session.modified = True
-    
     try:
         if delete_info['type'] == 'maintenance':
-            # Restore maintenance record
-            data = delete_info['data']
-            maintenance = MaintenanceRecord(
-                vehicle_id=data['vehicle_id'],
-                maintenance_type=data['maintenance_type'],
-                service_date=datetime.fromisoformat(data['service_date']).date(),
-                mileage_at_service=data['mileage_at_service'],
-                cost=data['cost'],
-                service_provider=data['service_provider'],
-                notes=data['notes'],
-                next_service_due=datetime.fromisoformat(data['next_service_due']).date() if data['next_service_due'] else None,
-                next_service_mileage=data['next_service_mileage']
-            )
-            db.session.add(maintenance)
+            # Restore maintenance record (the payload holds its column values as-is)
+            db.session.execute(db.insert(MaintenanceRecord).values(**delete_info['data']))
             db.session.commit()
             return jsonify({'success': True, 'message': 'Maintenance record restored!', 'redirect': url_for('vehicle_detail', id=delete_info['vehicle_id'])})
         
@@ -779,12 +1123,31 @@ def undo_delete():
         return jsonify({'success': False, 'message': f'Error: {str(e)}'})
 
 
+def document_vehicles():
+    """Only the columns the vehicle picker and the document matcher use, as plain dicts"""
+    return [row._asdict() for row in db.session.query(
+        Vehicle.id, Vehicle.vin, Vehicle.make, Vehicle.model, Vehicle.year, Vehicle.license_plate
+    )]
+
+
+def recent_uploads():
+    """Last five maintenance records added, for the upload page"""
+    return MaintenanceRecord.query.options(defer(MaintenanceRecord.notes)).order_by(
+        MaintenanceRecord.created_at.desc()
+    ).limit(5).all()
+
+
+def get_document_processor():
+    """Shared DocumentProcessor, created on first use so its OpenAI client and connections are reused"""
+    if 'doc_processor' not in app.extensions:
+        from document_processor import DocumentProcessor
+        app.extensions['doc_processor'] = DocumentProcessor(openai_api_key=os.getenv('OPENAI_API_KEY'), cache=doc_parse_cache)
+    return app.extensions['doc_processor']
+
+
 @app.route('/upload-document', methods=['GET', 'POST'])
 @login_required
 def upload_document():
-    vehicles = Vehicle.query.all()
-    recent_uploads = MaintenanceRecord.query.order_by(MaintenanceRecord.created_at.desc()).limit(5).all()
-    
     if request.method == 'POST':
         # Check if file was uploaded
         if 'document' not in request.files:
@@ -803,111 +1166,108 @@ def upload_document():
         
         if file:
             try:
-                # Read file content
+                # Hand the spooled upload straight to the processor instead of copying it into memory
                 filename = secure_filename(file.filename)
-                file_content = file.read()
+                file_size = file.stream.seek(0, os.SEEK_END)
                 
-                print(f"📄 Processing file: {filename}, Size: {len(file_content)} bytes")
+                app.logger.debug("📄 Processing file: %s, Size: %d bytes", filename, file_size)
                 
                 # Get preselected vehicle if any
                 preselected_vehicle_id = request.form.get('vehicle_id')
                 if preselected_vehicle_id:
                     preselected_vehicle_id = int(preselected_vehicle_id)
-                    print(f"🚗 Preselected vehicle ID: {preselected_vehicle_id}")
-                
-                # Initialize document processor
-                from document_processor import DocumentProcessor
-                api_key = os.getenv('OPENAI_API_KEY')
-                processor = DocumentProcessor(openai_api_key=api_key)
+                    app.logger.debug("🚗 Preselected vehicle ID: %s", preselected_vehicle_id)
                 
-                print(f"🤖 Using OpenAI: {'Yes' if api_key else 'No (fallback mode)'}")
+                processor = get_document_processor()
+                vehicles = document_vehicles()
                 
-                # Prepare vehicles list for processor
-                vehicles_list = [{
-                    'id': v.id,
-                    'vin': v.vin,
-                    'make': v.make,
-                    'model': v.model,
-                    'year': v.year,
-                    'license_plate': v.license_plate
-                } for v in vehicles]
+                app.logger.debug("🤖 Using OpenAI: %s", 'Yes' if processor.openai_client else 'No (fallback mode)')
                 
                 # Process document
                 result = processor.process_document(
                     filename, 
-                    file_content, 
-                    vehicles_list,
+                    file.stream, 
+                    vehicles,
                     preselected_vehicle_id
                 )
                 
-                print(f"📊 Processing result: {result.get('success')}")
+                app.logger.debug("📊 Processing result: %s", result.get('success'))
                 
                 if not result['success']:
                     error_msg = result['error']
-                    print(f"❌ Error: {error_msg}")
+                    app.logger.info("❌ Document not processed: %s", error_msg)
                     flash(f'❌ {error_msg}', 'danger')
                     return render_template('upload_document.html', 
                                          vehicles=vehicles, 
-                                         recent_uploads=recent_uploads,
+                                         recent_uploads=recent_uploads(),
                                          error_details=result.get('extracted_data'))
                 
                 # Create maintenance record from extracted data
-                vehicle = Vehicle.query.get(result['vehicle']['id'])
+                vehicle = result['vehicle']
                 
                 # Parse service date
-                service_date = datetime.now().date()
+                service_date = date.today()
                 if result.get('service_date'):
                     try:
-                        service_date = datetime.strptime(result['service_date'], '%Y-%m-%d').date()
+                        service_date = date.fromisoformat(result['service_date'])
                     except:
                         pass
                 
-                # Create maintenance record
-                maintenance = MaintenanceRecord(
-                    vehicle_id=vehicle.id,
+                # Create maintenance record with a Core insert - nothing reads the ORM object afterwards
+                # Without a reading from the document, fall back to the vehicle's mileage in the same INSERT
+                mileage = result.get('mileage')
+                db.session.execute(db.insert(MaintenanceRecord).values(
+                    vehicle_id=vehicle['id'],
                     maintenance_type=result['maintenance_type'],
                     service_date=service_date,
-                    mileage_at_service=result.get('mileage') or vehicle.current_mileage,
+                    mileage_at_service=mileage or db.select(Vehicle.current_mileage).where(
+                        Vehicle.id == vehicle['id']
+                    ).scalar_subquery(),
                     cost=result.get('cost') or 0.0,
                     service_provider=result.get('provider'),
                     notes=result.get('description'),
                     next_service_mileage=result.get('next_service_mileage')
-                )
+                ))
                 
-                # Update vehicle mileage if higher
-                if result.get('mileage') and result['mileage'] > vehicle.current_mileage:
-                    vehicle.current_mileage = result['mileage']
+                # Update vehicle mileage if higher, letting the database compare
+                if mileage:
+                    db.session.execute(
+                        db.update(Vehicle)
+                        .where(Vehicle.id == vehicle['id'], Vehicle.current_mileage < mileage)
+                        .values(current_mileage=mileage)
+                    )
                 
-                db.session.add(maintenance)
                 db.session.commit()
                 
-                print(f"✅ Successfully created maintenance record for vehicle {vehicle.id}")
+                app.logger.debug("✅ Successfully created maintenance record for vehicle %s", vehicle['id'])
                 
-                flash(f'✅ Document processed successfully! Created {result["maintenance_type"]} record for {vehicle.year} {vehicle.make} {vehicle.model}', 'success')
-                return redirect(url_for('vehicle_detail', id=vehicle.id))
+                flash(f'✅ Document processed successfully! Created {result["maintenance_type"]} record for {vehicle["year"]} {vehicle["make"]} {vehicle["model"]}', 'success')
+                return redirect(url_for('vehicle_detail', id=vehicle['id']))
                 
             except Exception as e:
                 error_detail = str(e)
-                print(f"❌ Exception during processing: {error_detail}")
-                import traceback
-                traceback.print_exc()
+                app.logger.exception("❌ Exception during processing: %s", error_detail)
                 flash(f'❌ Error processing document: {error_detail}', 'danger')
                 db.session.rollback()
                 return redirect(request.url)
     
+    # The picker and recent list are only queried when the page is actually rendered
     return render_template('upload_document.html', 
-                         vehicles=vehicles, 
-                         recent_uploads=recent_uploads)
+                         vehicles=document_vehicles(), 
+                         recent_uploads=recent_uploads())
 
 
 # ===== EXCEL IMPORT/EXPORT ROUTES =====
 
 @app.route('/import-data')
 @login_required
+@fleet_etag
 def import_data_page():
     """Display the data import page"""
-    total_vehicles = Vehicle.query.count()
-    total_records = MaintenanceRecord.query.count()
+    total_vehicles, total_records = db.session.query(
+        db.session.query(db.func.count(Vehicle.id)).scalar_subquery(),
+        db.session.query(db.func.count(MaintenanceRecord.id)).scalar_subquery()
+    ).one()
     return render_template('import_data.html', 
                          total_vehicles=total_vehicles,
                          total_records=total_records)
@@ -917,13 +1277,19 @@ def import_data_page():
 @login_required
 def download_template():
     """Download the Excel import template"""
-    from excel_handler import create_fleet_template
+    import excel_handler
     from flask import send_file
     
-    template = create_fleet_template()
+    # The template only changes with excel_handler.py, so build it once and serve the saved file
+    template_path = os.path.join(app.instance_path, 'Fleet_Import_Template.xlsx')
+    if not os.path.exists(template_path) or os.path.getmtime(template_path) < os.path.getmtime(excel_handler.__file__):
+        temp_path = f'{template_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(excel_handler.create_fleet_template().getvalue())
+        os.replace(temp_path, template_path)
     
     return send_file(
-        template,
+        template_path,
         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
         as_attachment=True,
         download_name='Fleet_Import_Template.xlsx'
@@ -955,39 +1321,8 @@ def upload_import_file():
         # Parse the Excel file
         parsed = parse_excel_import(file)
         
-        # Store parsed data in session for confirmation
-        session['import_data'] = {
-            'vehicles': [
-                {
-                    'vin': v['vin'],
-                    'make': v['make'],
-                    'model': v['model'],
-                    'year': v['year'],
-                    'license_plate': v['license_plate'],
-                    'purchase_date': v['purchase_date'].isoformat() if v.get('purchase_date') else None,
-                    'current_mileage': v['current_mileage'],
-                    'status': v['status'],
-                    'assigned_driver': v['assigned_driver']
-                }
-                for v in parsed['vehicles']
-            ],
-            'maintenance': [
-                {
-                    'vehicle_vin': m['vehicle_vin'],
-                    'maintenance_type': m['maintenance_type'],
-                    'service_date': m['service_date'].isoformat() if m.get('service_date') else None,
-                    'mileage_at_service': m['mileage_at_service'],
-                    'cost': m['cost'],
-                    'service_provider': m['service_provider'],
-                    'notes': m['notes'],
-                    'next_service_due': m['next_service_due'].isoformat() if m.get('next_service_due') else None,
-                    'next_service_mileage': m['next_service_mileage']
-                }
-                for m in parsed['maintenance']
-            ],
-            'errors': parsed['errors'],
-            'warnings': parsed['warnings']
-        }
+        # Store parsed data server-side for confirmation (the cache pickles it, so dates survive as-is)
+        stash_payload('import_data', parsed)
         
         return render_template('import_preview.html',
                              vehicles=parsed['vehicles'],
@@ -1005,34 +1340,16 @@ def upload_import_file():
 def confirm_import():
     """Confirm and execute the import"""
     from excel_handler import import_data_to_db
-    from datetime import date
     
-    if 'import_data' not in session:
+    import_data = pop_payload('import_data')
+    if import_data is None:
         flash('No import data found. Please upload a file first.', 'danger')
         return redirect(url_for('import_data_page'))
     
-    import_data = session['import_data']
     clear_existing = request.form.get('clear_existing') == 'yes'
     
-    # Convert date strings back to date objects
-    for v in import_data['vehicles']:
-        if v['purchase_date']:
-            v['purchase_date'] = date.fromisoformat(v['purchase_date'])
-    
-    for m in import_data['maintenance']:
-        if m['service_date']:
-            m['service_date'] = date.fromisoformat(m['service_date'])
-        if m['next_service_due']:
-            m['next_service_due'] = date.fromisoformat(m['next_service_due'])
-    
     # Execute import
-    result = import_data_to_db(
-        {'vehicles': import_data['vehicles'], 'maintenance': import_data['maintenance']},
-        db, Vehicle, MaintenanceRecord, clear_existing
-    )
-    
-    # Clear session data
-    session.pop('import_data', None)
+    result = import_data_to_db(import_data, db, Vehicle, MaintenanceRecord, clear_existing)
     
     if result['success']:
         message = f"✅ Import completed! Added {result['vehicles_added']} vehicles and {result['maintenance_added']} maintenance records."
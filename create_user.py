@@ -8,7 +8,8 @@ Usage:
 """
 
 import sys
-from app import app, db, User
+from sqlalchemy.dialects.sqlite import insert
+from app import app, db, User, password_hasher
 
 
 def create_user(username, password, email=None, is_admin=True):
@@ -17,32 +18,30 @@ def create_user(username, password, email=None, is_admin=True):
         # Create tables if they don't exist
         db.create_all()
         
-        # Check if user already exists
-        existing_user = User.query.filter_by(username=username).first()
-        if existing_user:
-            print(f"❌ User '{username}' already exists!")
-            reset = input("Do you want to reset their password? (y/n): ").strip().lower()
-            if reset == 'y':
-                existing_user.set_password(password)
-                db.session.commit()
-                print(f"✅ Password reset for user '{username}'")
-            return
-        
         # Generate email if not provided
         if not email:
             email = f"{username}@fleet.local"
         
-        # Create new user
-        user = User(
-            username=username,
-            email=email,
-            is_admin=is_admin
+        # Insert straight away; an existing username makes this a no-op instead of a separate lookup first
+        password_hash = password_hasher.hash(password)
+        result = db.session.execute(
+            insert(User)
+            .values(username=username, email=email, is_admin=is_admin, password_hash=password_hash)
+            .on_conflict_do_nothing(index_elements=['username'])
         )
-        user.set_password(password)
-        
-        db.session.add(user)
         db.session.commit()
         
+        if result.rowcount == 0:
+            print(f"❌ User '{username}' already exists!")
+            reset = input("Do you want to reset their password? (y/n): ").strip().lower()
+            if reset == 'y':
+                db.session.execute(
+                    db.update(User).where(User.username == username).values(password_hash=password_hash)
+                )
+                db.session.commit()
+                print(f"✅ Password reset for user '{username}'")
+            return
+        
         print(f"✅ User '{username}' created successfully!")
         print(f"   Email: {email}")
         print(f"   Admin: {'Yes' if is_admin else 'No'}")
@@ -51,19 +50,23 @@ def create_user(username, password, email=None, is_admin=True):
 def list_users():
     """List all users in the database"""
     with app.app_context():
-        users = User.query.all()
-        if not users:
-            print("No users found.")
-            return
+        # Only the printed columns, streamed in batches instead of building every User object
+        users = db.session.query(User.username, User.email, User.is_admin, User.last_login).yield_per(1000)
         
-        print("\n=== Users ===")
+        found = False
         for user in users:
+            if not found:
+                print("\n=== Users ===")
+                found = True
             admin_badge = "[ADMIN]" if user.is_admin else ""
             last_login = user.last_login.strftime('%Y-%m-%d %H:%M') if user.last_login else "Never"
             print(f"  • {user.username} {admin_badge}")
             print(f"    Email: {user.email}")
             print(f"    Last Login: {last_login}")
             print()
+        
+        if not found:
+            print("No users found.")
 
 
 def delete_user(username):
@@ -2,58 +2,231 @@
 AI-powered document processing for maintenance records
 Extracts vehicle information, maintenance details, dates, mileage, and costs from uploaded documents
 """
+import hashlib
+import json
+import logging
 import os
 import re
+import threading
 from datetime import datetime
-from typing import Dict, Optional, List
+from typing import BinaryIO, Dict, Optional, List, Union
 import PyPDF2
-from PIL import Image
+from PIL import Image, ImageOps
 import pytesseract
 from io import BytesIO
 
 # Try to import OpenAI - if not available, will use fallback parsing
 try:
     from openai import OpenAI
+    from pydantic import BaseModel, Field
     OPENAI_AVAILABLE = True
 except ImportError:
     OPENAI_AVAILABLE = False
 
+# Try to import tesserocr - keeps one Tesseract engine loaded instead of starting a process per image
+try:
+    from tesserocr import OEM, PSM, PyTessBaseAPI
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Cap how long an upload request can wait on OpenAI before falling back to regex parsing
+# (the client default is 10 minutes with 2 retries)
+OPENAI_TIMEOUT = 30  # seconds
+OPENAI_MAX_RETRIES = 1
+OPENAI_MODEL = "gpt-4o-mini"
+# Parsed AI responses are reused for re-uploads of the same document against the same fleet
+AI_RESPONSE_CACHE_TIMEOUT = 7 * 24 * 60 * 60  # seconds
+# Receipts and invoices carry everything needed well within this many characters
+AI_TEXT_LIMIT = 6000
+# Eight short fields fit comfortably; a runaway reply is cut off and falls back to regex parsing
+AI_MAX_TOKENS = 400
+
+# Identical on every call, so OpenAI can reuse its cached prefix; per-document data goes in the user message.
+# The field definitions travel as the MaintenanceExtraction schema below
+AI_SYSTEM_PROMPT = "Extract vehicle-maintenance fields per the schema. Use null for anything not clearly stated in the document."
+
+# Tesseract time grows with pixel count; receipts stay legible well below phone camera resolution
+OCR_MAX_DIMENSION = 2000  # pixels, longest side
+# Stop reading PDF pages once this much text is in hand - far more than any receipt or invoice needs
+PDF_TEXT_LIMIT = 20000  # characters
+
+# Regex fallback patterns, compiled once at import rather than looked up on every document
+VIN_RE = re.compile(r'\b[A-HJ-NPR-Z0-9]{17}\b', re.IGNORECASE)
+LICENSE_PLATE_RES = (
+    re.compile(r'\b[A-Z]{2,3}[0-9]{3,4}\b', re.IGNORECASE),
+    re.compile(r'\b[0-9]{1,3}[A-Z]{2,3}[0-9]{1,3}\b', re.IGNORECASE),
+)
+# Any 4-digit number so OCR errors like "5018" for "2018" still match
+VEHICLE_LABEL_RE = re.compile(r'Vehicle\s*:\s*(\d{4})\s+([A-Za-z]+)\s+([A-Za-z]+)', re.IGNORECASE)
+YEAR_MAKE_MODEL_RE = re.compile(r'(19[9][0-9]|20[0-3][0-9])\s+([A-Za-z]+)\s+([A-Za-z][a-z]+(?:\s+[A-Z0-9][a-z0-9]+)*)', re.IGNORECASE)
+MAKE_MODEL_RE = re.compile(r'\b(Ford|Mercedes|Toyota|Chevrolet|GMC|RAM|Dodge|Honda|Nissan)\s+([A-Za-z][a-z]+(?:\s+[A-Z0-9][a-z0-9]+)*)', re.IGNORECASE)
+MILEAGE_RES = (
+    re.compile(r'(?:mileage|odometer|miles?)[\s:]+([0-9,]+)', re.IGNORECASE),
+    re.compile(r'([0-9,]+)[\s]+(?:miles?|mi\b)', re.IGNORECASE),
+)
+# Every money-looking amount in one pass: after a "total"/"amount due" label or a dollar sign,
+# or else any standalone decimal with two places
+COST_RE = re.compile(
+    r'(?:(?P<label>(?:total|grand\s*total|amount\s*due|total\s*due|balance|total\s*cost)[\s:$]*\$?\s?|\$\s?)|\b)'
+    r'([0-9,]+\.[0-9]{2})(?(label)|\b)',
+    re.IGNORECASE
+)
+# Month/day/year first, then year-month-day; the first date-shaped match of each is tried
+MDY_DATE_RE = re.compile(r'(?P<month>\d{1,2})(?P<sep>[-/])(?P<day>\d{1,2})(?P<sep2>[-/])(?P<year>\d{2,4})')
+YMD_DATE_RE = re.compile(r'(?P<year>\d{4})(?P<sep>[-/])(?P<month>\d{1,2})(?P<sep2>[-/])(?P<day>\d{1,2})')
+# Any digit at all - a document without one is not worth an OpenAI call
+DIGIT_RE = re.compile(r'\d')
+# Alphanumeric runs of an identifier, looked up as whole plates
+PLATE_TOKEN_RE = re.compile(r'[A-Z0-9]+')
+
+# Leading digits OCR commonly reads in place of the "2" of a 20xx year (5018 -> 2018)
+OCR_YEAR_PREFIXES = ('5', '7', '4')
+
+# Maintenance type keywords, checked in order - the first type with a match wins
+MAINTENANCE_KEYWORDS = {
+    "Smog Check": ("smog", "smog check", "smog test", "smog inspection", "emissions"),
+    "Oil Change": ("oil change", "oil service", "lube"),
+    "Tire Rotation": ("tire rotation", "rotate tires"),
+    "Brake Service": ("brake", "brakes", "brake pad", "brake service"),
+    "Inspection": ("inspection", "state inspection", "safety check"),
+    "Tune-Up": ("tune-up", "tune up", "tuneup"),
+    "Transmission": ("transmission", "trans service"),
+    "Battery": ("battery", "battery replacement"),
+    "Alignment": ("alignment", "wheel alignment"),
+}
+MAINTENANCE_KEYWORD_TYPES = {
+    keyword: service_type for service_type, keywords in MAINTENANCE_KEYWORDS.items() for keyword in keywords
+}
+MAINTENANCE_TYPE_PRIORITY = {service_type: rank for rank, service_type in enumerate(MAINTENANCE_KEYWORDS)}
+# A single scan for every keyword; the lookahead makes matches zero-width, so overlapping keywords are all seen
+MAINTENANCE_KEYWORD_RE = re.compile(
+    '(?=(' + '|'.join(re.escape(keyword) for keyword in sorted(MAINTENANCE_KEYWORD_TYPES, key=len, reverse=True)) + '))'
+)
+
+
+if OPENAI_AVAILABLE:
+    class MaintenanceExtraction(BaseModel):
+        """Structured Outputs schema for parse_with_ai; the model's reply is validated against it"""
+        vehicle_identifier: Optional[str] = Field(description="VIN, license plate, or full year, make and model (e.g. \"2017 Ford Transit\") to match against the known vehicles")
+        maintenance_type: Optional[str] = Field(description="Type of service, e.g. Oil Change, Tire Rotation, Brake Service")
+        description: Optional[str] = Field(description="Work performed")
+        service_date: Optional[str] = Field(description="Service date as YYYY-MM-DD")
+        mileage: Optional[int] = Field(description="Odometer reading")
+        cost: Optional[float] = Field(description="Total cost, no currency sign")
+        provider: Optional[str] = Field(description="Service provider or shop name")
+        next_service_mileage: Optional[int] = Field(description="Recommended next service mileage")
+
+    # Cached parses are only valid for the schema they were produced under
+    AI_SCHEMA_KEY = hashlib.blake2b(
+        json.dumps(MaintenanceExtraction.model_json_schema(), sort_keys=True).encode(), digest_size=8
+    ).hexdigest()
+
+
+def as_stream(file_content: Union[bytes, BinaryIO]) -> BinaryIO:
+    """Wrap raw bytes in a stream; file objects are rewound and used as-is"""
+    if isinstance(file_content, (bytes, bytearray)):
+        return BytesIO(file_content)
+    file_content.seek(0)
+    return file_content
+
+
+def prepare_for_ocr(image: Image.Image) -> Image.Image:
+    """Upright, grayscale copy of an image, downscaled to OCR_MAX_DIMENSION"""
+    # Phone photos are often stored sideways with an EXIF rotation flag
+    image = ImageOps.exif_transpose(image).convert('L')
+    # thumbnail() only ever shrinks and keeps the aspect ratio
+    image.thumbnail((OCR_MAX_DIMENSION, OCR_MAX_DIMENSION), Image.LANCZOS)
+    return image
+
+
+def date_from_match(match: Optional[re.Match]) -> Optional[str]:
+    """YYYY-MM-DD for an MDY_DATE_RE/YMD_DATE_RE match, or None if it isn't a real date"""
+    if not match:
+        return None
+    sep, year = match.group('sep'), match.group('year')
+    # Accepted forms: MM/DD/YYYY, MM-DD-YYYY, MM/DD/YY and YYYY-MM-DD
+    if match.re is YMD_DATE_RE:
+        valid = sep == match.group('sep2') == '-'
+    else:
+        valid = sep == match.group('sep2') and (len(year) == 4 or (len(year) == 2 and sep == '/'))
+    if not valid:
+        return None
+    if len(year) == 2:
+        # Same pivot as strptime's %y: 69-99 -> 19xx, 00-68 -> 20xx
+        year = ('19' if year >= '69' else '20') + year
+    try:
+        return datetime(int(year), int(match.group('month')), int(match.group('day'))).strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
 
 class DocumentProcessor:
-    def __init__(self, openai_api_key: Optional[str] = None):
-        """Initialize the document processor with optional OpenAI API key"""
+    def __init__(self, openai_api_key: Optional[str] = None, cache=None):
+        """Initialize the document processor with optional OpenAI API key and response cache (any get/set store)"""
         self.openai_client = None
+        self.cache = cache
+        # (vehicles list, its match index) for the last fleet matched against
+        self._vehicle_index = (None, None)
+        # (vehicles list, id -> vehicle map) for preselected-vehicle lookups
+        self._vehicle_ids = (None, None)
+        # Persistent tesserocr engine, created on first OCR; one image at a time
+        self._tess_api = None
+        self._tess_lock = threading.Lock()
         if OPENAI_AVAILABLE and openai_api_key:
-            self.openai_client = OpenAI(api_key=openai_api_key)
+            self.openai_client = OpenAI(api_key=openai_api_key, timeout=OPENAI_TIMEOUT, max_retries=OPENAI_MAX_RETRIES)
     
-    def extract_text_from_pdf(self, file_content: bytes) -> str:
+    def extract_text_from_pdf(self, file_content: Union[bytes, BinaryIO]) -> str:
         """Extract text from PDF file"""
         try:
-            pdf_reader = PyPDF2.PdfReader(BytesIO(file_content))
-            text = ""
+            pdf_reader = PyPDF2.PdfReader(as_stream(file_content))
+            # Pages are parsed lazily, so long service histories stop being read at the limit
+            parts = []
+            length = 0
             for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            return text
+                page_text = (page.extract_text() or "") + "\n"
+                parts.append(page_text)
+                length += len(page_text)
+                if length >= PDF_TEXT_LIMIT:
+                    break
+            return "".join(parts)
         except Exception as e:
-            print(f"Error extracting text from PDF: {e}")
+            logger.warning("Error extracting text from PDF: %s", e)
             return ""
     
-    def extract_text_from_image(self, file_content: bytes) -> str:
+    def extract_text_from_image(self, file_content: Union[bytes, BinaryIO]) -> str:
         """Extract text from image using OCR"""
         try:
-            image = Image.open(BytesIO(file_content))
-            # Improve OCR accuracy with config options
-            custom_config = r'--oem 3 --psm 6'
-            text = pytesseract.image_to_string(image, config=custom_config)
-            print(f"📜 FULL OCR TEXT:\n{text}\n{'='*50}")
+            image = prepare_for_ocr(Image.open(as_stream(file_content)))
+            text = self.ocr_image(image)
+            logger.debug("📜 FULL OCR TEXT:\n%s\n%s", text, '=' * 50)
             return text
         except pytesseract.TesseractNotFoundError:
             raise Exception("Tesseract OCR is not installed. Please install Tesseract from https://github.com/tesseract-ocr/tesseract and add it to your system PATH. For Windows: Download the installer from https://github.com/UB-Mannheim/tesseract/wiki")
         except Exception as e:
-            print(f"Error extracting text from image: {e}")
+            logger.warning("Error extracting text from image: %s", e)
             raise Exception(f"Failed to extract text from image: {str(e)}")
     
-    def extract_text(self, filename: str, file_content: bytes) -> str:
+    def ocr_image(self, image: Image.Image) -> str:
+        """Run Tesseract on an image, reusing a loaded engine when tesserocr is installed"""
+        if TESSEROCR_AVAILABLE:
+            with self._tess_lock:
+                try:
+                    if self._tess_api is None:
+                        # Same settings as the pytesseract flags below
+                        self._tess_api = PyTessBaseAPI(psm=PSM.SINGLE_BLOCK, oem=OEM.DEFAULT)
+                    self._tess_api.SetImage(image)
+                    return self._tess_api.GetUTF8Text()
+                except RuntimeError as e:
+                    logger.warning("tesserocr unavailable, falling back to pytesseract: %s", e)
+        
+        # Improve OCR accuracy with config options
+        custom_config = r'--oem 3 --psm 6'
+        return pytesseract.image_to_string(image, config=custom_config)
+    
+    def extract_text(self, filename: str, file_content: Union[bytes, BinaryIO]) -> str:
         """Extract text from document based on file type"""
         ext = filename.lower().rsplit('.', 1)[1] if '.' in filename else ''
         
@@ -70,51 +243,47 @@ class DocumentProcessor:
             return self.parse_with_regex(text, vehicles)
         
         try:
-            # Create a list of known vehicles for context
-            vehicle_context = "\n".join([
-                f"- {v['year']} {v['make']} {v['model']} (VIN: {v['vin']}, License: {v['license_plate']})"
+            # Known vehicles as a compact table; the fixed instructions live in AI_SYSTEM_PROMPT
+            vehicle_table = "\n".join(
+                f"{v['year']}\t{v['make']}\t{v['model']}\t{v['vin']}\t{v['license_plate']}"
                 for v in vehicles
-            ])
+            )
+            prompt = f"Vehicles (year, make, model, VIN, plate):\n{vehicle_table}\n\nDocument:\n{text[:AI_TEXT_LIMIT]}"
             
-            prompt = f"""You are analyzing a vehicle maintenance document. Extract the following information and return it as JSON:
-
-Known vehicles in the system:
-{vehicle_context}
-
-Document text:
-{text}
-
-Extract and return JSON with these fields (use null if not found):
-{{
-    "vehicle_identifier": "VIN, license plate, OR year+make+model (e.g., '2017 Ford Transit', '2022 Mercedes Metris'). IMPORTANT: Extract the full vehicle description including year, make, and model even if no VIN/plate is visible.",
-    "maintenance_type": "Type of service (Oil Change, Tire Rotation, Brake Service, etc.)",
-    "description": "Detailed description of work performed",
-    "service_date": "Date in YYYY-MM-DD format",
-    "mileage": "Mileage as integer (just the number)",
-    "cost": "Total cost as decimal (just the number, no $ sign)",
-    "provider": "Name of service provider/shop",
-    "next_service_mileage": "Recommended next service mileage if mentioned"
-}}
-
-IMPORTANT: For vehicle_identifier, if you can't find VIN or license plate, extract the year, make, and model (e.g., '2017 Ford Transit') to match against the known vehicles.
-Be precise and only extract information that is clearly stated in the document."""
-
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o-mini",
+            # The prompt holds the document text and the whole vehicle list, so with the instructions it is the cache key
+            cache_key = None
+            if self.cache is not None:
+                cache_key = 'doc_parse:' + hashlib.blake2b(
+                    f'{OPENAI_MODEL}|{AI_SCHEMA_KEY}|{AI_SYSTEM_PROMPT}|{prompt}'.encode(), digest_size=16
+                ).hexdigest()
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    logger.debug("♻️ Reusing cached AI parse")
+                    return cached
+            
+            response = self.openai_client.beta.chat.completions.parse(
+                model=OPENAI_MODEL,
                 messages=[
-                    {"role": "system", "content": "You are a precise data extraction assistant. Return only valid JSON."},
+                    {"role": "system", "content": AI_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
-                response_format={"type": "json_object"},
-                temperature=0.1
+                response_format=MaintenanceExtraction,
+                temperature=0.1,
+                max_tokens=AI_MAX_TOKENS
             )
             
-            import json
-            result = json.loads(response.choices[0].message.content)
+            parsed = response.choices[0].message.parsed
+            if parsed is None:
+                # The model refused; nothing to cache
+                logger.warning("AI parsing refused: %s", response.choices[0].message.refusal)
+                return self.parse_with_regex(text, vehicles)
+            result = parsed.model_dump()
+            if cache_key is not None:
+                self.cache.set(cache_key, result, timeout=AI_RESPONSE_CACHE_TIMEOUT)
             return result
             
         except Exception as e:
-            print(f"AI parsing error: {e}")
+            logger.warning("AI parsing error: %s", e)
             return self.parse_with_regex(text, vehicles)
     
     def parse_with_regex(self, text: str, vehicles: List[Dict]) -> Dict:
@@ -131,18 +300,14 @@ Be precise and only extract information that is clearly stated in the document."
         }
         
         # Extract VIN (17 characters alphanumeric)
-        vin_match = re.search(r'\b[A-HJ-NPR-Z0-9]{17}\b', text, re.IGNORECASE)
+        vin_match = VIN_RE.search(text)
         if vin_match:
             result["vehicle_identifier"] = vin_match.group()
         
         # Extract license plate patterns
         if not result["vehicle_identifier"]:
-            license_patterns = [
-                r'\b[A-Z]{2,3}[0-9]{3,4}\b',
-                r'\b[0-9]{1,3}[A-Z]{2,3}[0-9]{1,3}\b'
-            ]
-            for pattern in license_patterns:
-                match = re.search(pattern, text, re.IGNORECASE)
+            for pattern in LICENSE_PLATE_RES:
+                match = pattern.search(text)
                 if match:
                     result["vehicle_identifier"] = match.group()
                     break
@@ -150,158 +315,159 @@ Be precise and only extract information that is clearly stated in the document."
         # Extract year/make/model if no VIN/plate found
         if not result["vehicle_identifier"]:
             # Priority 1: Look for "Vehicle:" label (common on receipts)
-            # Handle OCR errors like "5018" for "2018" by matching any 4-digit number
-            vehicle_label = re.search(r'Vehicle\s*:\s*(\d{4})\s+([A-Za-z]+)\s+([A-Za-z]+)', text, re.IGNORECASE)
+            vehicle_label = VEHICLE_LABEL_RE.search(text)
             if vehicle_label:
                 year_ocr = vehicle_label.group(1)
                 make = vehicle_label.group(2)
                 model = vehicle_label.group(3)
                 # Convert OCR-mangled years: 5018->2018, 7017->2017, etc.
-                if year_ocr.startswith('5') or year_ocr.startswith('7') or year_ocr.startswith('4'):
+                if year_ocr.startswith(OCR_YEAR_PREFIXES):
                     year_fixed = '20' + year_ocr[2:]
-                    print(f"🔧 OCR year fix: {year_ocr} -> {year_fixed}")
+                    logger.debug("🔧 OCR year fix: %s -> %s", year_ocr, year_fixed)
                     result["vehicle_identifier"] = f"{year_fixed} {make} {model}"
                 else:
                     result["vehicle_identifier"] = vehicle_label.group().replace('Vehicle:', '').replace('Vehicle :', '').strip()
             else:
                 # Priority 2: Standard year + make + model pattern
-                year_make_model = re.search(r'(19[9][0-9]|20[0-3][0-9])\s+([A-Za-z]+)\s+([A-Za-z][a-z]+(?:\s+[A-Z0-9][a-z0-9]+)*)', text, re.IGNORECASE)
+                year_make_model = YEAR_MAKE_MODEL_RE.search(text)
                 if year_make_model:
                     result["vehicle_identifier"] = year_make_model.group().strip()
                 else:
                     # Priority 3: Just make and model
-                    make_model = re.search(r'\b(Ford|Mercedes|Toyota|Chevrolet|GMC|RAM|Dodge|Honda|Nissan)\s+([A-Za-z][a-z]+(?:\s+[A-Z0-9][a-z0-9]+)*)', text, re.IGNORECASE)
+                    make_model = MAKE_MODEL_RE.search(text)
                     if make_model:
                         result["vehicle_identifier"] = make_model.group().strip()
         
-        print(f"🚗 Extracted vehicle identifier: {result.get('vehicle_identifier')}")
+        logger.debug("🚗 Extracted vehicle identifier: %s", result.get('vehicle_identifier'))
         
         # Extract mileage
-        mileage_patterns = [
-            r'(?:mileage|odometer|miles?)[\s:]+([0-9,]+)',
-            r'([0-9,]+)[\s]+(?:miles?|mi\b)'
-        ]
-        for pattern in mileage_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in MILEAGE_RES:
+            match = pattern.search(text)
             if match:
                 result["mileage"] = int(match.group(1).replace(',', ''))
                 break
         
         # Extract cost/total - improved patterns to get the TOTAL cost
-        cost_patterns = [
-            # Priority 1: Look for "total" or "amount due" specifically
-            r'(?:total|grand\s*total|amount\s*due|total\s*due|balance|total\s*cost)[\s:$]*\$?\s?([0-9,]+\.[0-9]{2})',
-            # Priority 2: Dollar amounts at end of lines (often the total)
-            r'\$\s?([0-9,]+\.[0-9]{2})\s*$',
-            # Priority 3: Any dollar amount
-            r'\$\s?([0-9,]+\.[0-9]{2})',
-            # Priority 4: Decimals that look like money
-            r'\b([0-9,]+\.[0-9]{2})\b'
-        ]
-        
-        all_costs = []
-        for pattern in cost_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)
-            if matches:
-                for m in matches:
-                    try:
-                        cost_val = float(m.replace(',', ''))
-                        if 1.0 <= cost_val <= 50000:  # Reasonable maintenance cost range
-                            all_costs.append(cost_val)
-                    except:
-                        pass
+        # Use the largest cost as the total (usually the final amount)
+        best_cost = 0.0
+        for match in COST_RE.finditer(text):
+            try:
+                cost_val = float(match.group(2).replace(',', ''))
+            except ValueError:
+                continue
+            if 1.0 <= cost_val <= 50000 and cost_val > best_cost:  # Reasonable maintenance cost range
+                best_cost = cost_val
         
-        if all_costs:
-            # Use the largest cost as the total (usually the final amount)
-            result["cost"] = max(all_costs)
-            print(f"💰 Found costs: {all_costs}, using max: {result['cost']}")
+        if best_cost:
+            result["cost"] = best_cost
+            logger.debug("💰 Using largest cost found: %s", best_cost)
         
         # Extract dates
-        date_patterns = [
-            r'(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})',
-            r'(\d{4}[-/]\d{1,2}[-/]\d{1,2})'
-        ]
-        for pattern in date_patterns:
-            match = re.search(pattern, text)
-            if match:
-                try:
-                    # Try to parse the date
-                    date_str = match.group(1)
-                    for fmt in ['%m/%d/%Y', '%m-%d-%Y', '%Y-%m-%d', '%m/%d/%y']:
-                        try:
-                            parsed_date = datetime.strptime(date_str, fmt)
-                            result["service_date"] = parsed_date.strftime('%Y-%m-%d')
-                            break
-                        except:
-                            continue
-                    if result["service_date"]:
-                        break
-                except:
-                    pass
+        result["service_date"] = date_from_match(MDY_DATE_RE.search(text)) or date_from_match(YMD_DATE_RE.search(text))
         
         # Detect maintenance type from common keywords
-        maintenance_keywords = {
-            "Smog Check": ["smog", "smog check", "smog test", "smog inspection", "emissions"],
-            "Oil Change": ["oil change", "oil service", "lube"],
-            "Tire Rotation": ["tire rotation", "rotate tires"],
-            "Brake Service": ["brake", "brakes", "brake pad", "brake service"],
-            "Inspection": ["inspection", "state inspection", "safety check"],
-            "Tune-Up": ["tune-up", "tune up", "tuneup"],
-            "Transmission": ["transmission", "trans service"],
-            "Battery": ["battery", "battery replacement"],
-            "Alignment": ["alignment", "wheel alignment"],
-        }
-        
-        text_lower = text.lower()
-        for service_type, keywords in maintenance_keywords.items():
-            if any(keyword in text_lower for keyword in keywords):
+        best_rank = len(MAINTENANCE_KEYWORDS)
+        for match in MAINTENANCE_KEYWORD_RE.finditer(text.lower()):
+            service_type = MAINTENANCE_KEYWORD_TYPES[match.group(1)]
+            rank = MAINTENANCE_TYPE_PRIORITY[service_type]
+            if rank < best_rank:
+                best_rank = rank
                 result["maintenance_type"] = service_type
-                break
+                if rank == 0:
+                    break
         
         if not result["maintenance_type"]:
             result["maintenance_type"] = "General Service"
         
         return result
     
+    def _vehicles_by_id(self, vehicles: List[Dict]) -> Dict[int, Dict]:
+        """id -> vehicle map, built once per vehicles list"""
+        mapped_vehicles, by_id = self._vehicle_ids
+        if mapped_vehicles is not vehicles:
+            # Reversed so the first vehicle wins on duplicate ids, like a linear scan
+            by_id = {vehicle['id']: vehicle for vehicle in reversed(vehicles)}
+            self._vehicle_ids = (vehicles, by_id)
+        return by_id
+    
+    def _index_vehicles(self, vehicles: List[Dict]) -> tuple:
+        """(VIN map, plate map, uppercased match tokens per vehicle), built once per vehicles list"""
+        # Holding the list itself (not its id) means a recycled id can never return a stale index
+        indexed_vehicles, index = self._vehicle_index
+        if indexed_vehicles is not vehicles:
+            # Reversed so the first vehicle wins on duplicates, like the scan below
+            vin_map = {vehicle['vin'].upper(): vehicle for vehicle in reversed(vehicles) if vehicle['vin']}
+            plate_map = {vehicle['license_plate'].upper(): vehicle for vehicle in reversed(vehicles) if vehicle['license_plate']}
+            rows = tuple(
+                (
+                    vehicle,
+                    vehicle['vin'].upper() if vehicle['vin'] else None,
+                    vehicle['license_plate'].upper() if vehicle['license_plate'] else None,
+                    str(vehicle['year']),
+                    # OCR-mangled years (e.g., 5018 = 2018, 7017 = 2017)
+                    tuple(prefix + str(vehicle['year'])[1:] for prefix in OCR_YEAR_PREFIXES),
+                    vehicle['make'].upper(),
+                    # Significant model words for partial matching (e.g., "Transit Connect" -> ("TRANSIT", "CONNECT"))
+                    tuple(part for part in vehicle['model'].upper().split() if len(part) >= 4),
+                )
+                for vehicle in vehicles
+            )
+            index = (vin_map, plate_map, rows)
+            self._vehicle_index = (vehicles, index)
+        return index
+    
+    def exact_vehicle_match(self, identifier: Optional[str], vehicles: List[Dict]) -> Optional[Dict]:
+        """Vehicle whose whole VIN or license plate appears as a token in the identifier"""
+        if not identifier:
+            return None
+        
+        identifier = identifier.upper()
+        vin_map, plate_map, _ = self._index_vehicles(vehicles)
+        for token in VIN_RE.findall(identifier):
+            if token in vin_map:
+                return vin_map[token]
+        for token in PLATE_TOKEN_RE.findall(identifier):
+            if token in plate_map:
+                return plate_map[token]
+        return None
+    
     def match_vehicle(self, identifier: Optional[str], vehicles: List[Dict], mileage: Optional[int] = None) -> Optional[Dict]:
         """Match extracted identifier to a vehicle in the system"""
         if not identifier:
             return None
         
+        # Fast path: a whole VIN or plate in the identifier is a single dict lookup
+        exact_match = self.exact_vehicle_match(identifier, vehicles)
+        if exact_match:
+            return exact_match
+        
         identifier = identifier.upper()
+        _, _, rows = self._index_vehicles(vehicles)
         
         # Track partial matches for fallback
         partial_matches = []
         
-        for vehicle in vehicles:
+        # VINs and plates embedded in other text still match by substring below
+        for vehicle, vin, plate, year_str, ocr_years, make_upper, model_parts in rows:
             # Check VIN match (highest priority)
-            if vehicle['vin'] and vehicle['vin'].upper() in identifier:
+            if vin and vin in identifier:
                 return vehicle
             
             # Check license plate match (high priority)
-            if vehicle['license_plate'] and vehicle['license_plate'].upper() in identifier:
+            if plate and plate in identifier:
                 return vehicle
             
-            # Check for year + make + model match (exact combination)
-            year_str = str(vehicle['year'])
-            make_upper = vehicle['make'].upper()
-            model_upper = vehicle['model'].upper()
-            
-            # Split model into parts for partial matching (e.g., "Transit Connect" -> ["TRANSIT", "CONNECT"])
-            model_parts = model_upper.split()
-            
-            # Count how many components match
+            # Count how many components of year + make + model match
             match_score = 0
             
             # Check for year - also handle OCR errors like "5018" for "2018"
             if year_str in identifier:
                 match_score += 4  # Exact year match is very important
             else:
-                # Check for OCR-mangled years (e.g., 5018 = 2018, 7017 = 2017)
-                for ocr_year in [f"5{year_str[1:]}", f"7{year_str[1:]}", f"4{year_str[1:]}"]:
+                for ocr_year in ocr_years:
                     if ocr_year in identifier:
                         match_score += 3  # OCR year match
-                        print(f"🔧 OCR year correction: {ocr_year} -> {year_str}")
+                        logger.debug("🔧 OCR year correction: %s -> %s", ocr_year, year_str)
                         break
             
             if make_upper in identifier:
@@ -310,7 +476,7 @@ Be precise and only extract information that is clearly stated in the document."
             # Check if any significant part of the model matches
             # For models like "Transit Connect", if "TRANSIT" matches, that's good
             for part in model_parts:
-                if len(part) >= 4 and part in identifier:  # Only check significant words (4+ chars)
+                if part in identifier:
                     match_score += 3
                     break  # One significant match is enough
             
@@ -319,32 +485,32 @@ Be precise and only extract information that is clearly stated in the document."
                 mileage_diff = abs(mileage - vehicle['current_mileage'])
                 if mileage_diff < 5000:  # Within 5000 miles
                     match_score += 2
-                    print(f"📍 Mileage proximity bonus for {vehicle['year']} {vehicle['make']} {vehicle['model']}: doc={mileage}, vehicle={vehicle['current_mileage']}")
+                    logger.debug("📍 Mileage proximity bonus for %s %s %s: doc=%s, vehicle=%s", vehicle['year'], vehicle['make'], vehicle['model'], mileage, vehicle['current_mileage'])
             
             # If we have make and at least part of model, that's a good match
             if match_score >= 6:  # Make (3) + Model part (3) = 6
                 partial_matches.append((match_score, vehicle))
-                print(f"📊 Match candidate: {vehicle['year']} {vehicle['make']} {vehicle['model']} - score: {match_score}")
+                logger.debug("📊 Match candidate: %s %s %s - score: %s", vehicle['year'], vehicle['make'], vehicle['model'], match_score)
         
         # Return the best partial match if we found any
         if partial_matches:
             # Sort by score (highest first) and return best match
             partial_matches.sort(key=lambda x: x[0], reverse=True)
             best_match = partial_matches[0][1]
-            print(f"🏆 Best match: {best_match['year']} {best_match['make']} {best_match['model']} with score {partial_matches[0][0]}")
+            logger.debug("🏆 Best match: %s %s %s with score %s", best_match['year'], best_match['make'], best_match['model'], partial_matches[0][0])
             return best_match
         
         return None
     
-    def process_document(self, filename: str, file_content: bytes, vehicles: List[Dict], 
+    def process_document(self, filename: str, file_content: Union[bytes, BinaryIO], vehicles: List[Dict], 
                         preselected_vehicle_id: Optional[int] = None) -> Dict:
         """Main processing pipeline for uploaded documents"""
         # Extract text from document
         text = self.extract_text(filename, file_content)
         
-        print(f"📄 Extracted text length: {len(text) if text else 0} characters")
+        logger.debug("📄 Extracted text length: %d characters", len(text) if text else 0)
         if text:
-            print(f"📄 First 200 chars: {text[:200]}")
+            logger.debug("📄 First 200 chars: %s", text[:200])
         
         if not text or len(text.strip()) < 50:
             return {
@@ -352,23 +518,40 @@ Be precise and only extract information that is clearly stated in the document."
                 "error": "Could not extract sufficient text from document. Please ensure the document is clear and readable."
             }
         
-        # Parse document with AI or regex
-        parsed_data = self.parse_with_ai(text, vehicles)
-        print(f"🔍 Parsed data: {parsed_data}")
-        
         # Match to vehicle
         matched_vehicle = None
         if preselected_vehicle_id:
-            matched_vehicle = next((v for v in vehicles if v['id'] == preselected_vehicle_id), None)
-            print(f"✅ Using preselected vehicle: {matched_vehicle}")
+            matched_vehicle = self._vehicles_by_id(vehicles).get(preselected_vehicle_id)
+            logger.debug("✅ Using preselected vehicle: %s", matched_vehicle)
+        
+        # Regex first; only skip OpenAI when the document names a known VIN or plate and regex found the
+        # date, cost and service type. Looser matches still go to OpenAI for provider, description and next service.
+        parsed_data = self.parse_with_regex(text, vehicles)
+        # Without a single digit there is no date, cost, mileage or VIN for OpenAI to find either
+        if self.openai_client and not DIGIT_RE.search(text):
+            logger.info("⚡ No digits in document text, skipped OpenAI")
+        elif self.openai_client:
+            regex_vehicle = self.exact_vehicle_match(parsed_data.get('vehicle_identifier'), vehicles)
+            if (regex_vehicle and parsed_data['cost'] and parsed_data['service_date']
+                    and parsed_data['maintenance_type'] != 'General Service'):
+                matched_vehicle = matched_vehicle or regex_vehicle
+                logger.info("⚡ Regex parse was complete, skipped OpenAI")
+            else:
+                regex_data = parsed_data
+                parsed_data = self.parse_with_ai(text, vehicles)
+                # Keep AI values, fill whatever it left empty from the regex pass
+                for key, value in regex_data.items():
+                    if parsed_data.get(key) is None:
+                        parsed_data[key] = value
+        logger.debug("🔍 Parsed data: %s", parsed_data)
         
         if not matched_vehicle and parsed_data.get('vehicle_identifier'):
-            print(f"🔎 Attempting to match vehicle with identifier: {parsed_data.get('vehicle_identifier')}")
+            logger.debug("🔎 Attempting to match vehicle with identifier: %s", parsed_data.get('vehicle_identifier'))
             matched_vehicle = self.match_vehicle(parsed_data['vehicle_identifier'], vehicles, parsed_data.get('mileage'))
             if matched_vehicle:
-                print(f"✅ Matched vehicle: {matched_vehicle['year']} {matched_vehicle['make']} {matched_vehicle['model']}")
+                logger.debug("✅ Matched vehicle: %s %s %s", matched_vehicle['year'], matched_vehicle['make'], matched_vehicle['model'])
             else:
-                print(f"❌ No vehicle matched")
+                logger.debug("❌ No vehicle matched")
         
         if not matched_vehicle:
             return {
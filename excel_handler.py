@@ -4,11 +4,97 @@ Handles template generation and data import from Excel files
 """
 
 import io
-from datetime import datetime
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Optional
 from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.comments import Comment
 from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
 from openpyxl.utils import get_column_letter
 from openpyxl.worksheet.datavalidation import DataValidation
+from sqlalchemy import insert
+
+
+# Template columns: (header, description shown as the header's comment, width)
+VEHICLE_COLUMNS = [
+    ('VIN*', 'Vehicle Identification Number (17 characters)', 20),
+    ('Make*', 'Vehicle manufacturer (e.g., Ford, Toyota)', 15),
+    ('Model*', 'Vehicle model (e.g., Transit 250)', 20),
+    ('Year*', 'Model year (e.g., 2024)', 10),
+    ('License Plate*', 'License plate number', 15),
+    ('Purchase Date*', 'Date purchased (YYYY-MM-DD)', 15),
+    ('Current Mileage', 'Current odometer reading', 15),
+    ('Status', 'Active, In Maintenance, or Retired', 15),
+    ('Assigned Driver', 'Driver name', 20),
+]
+MAINTENANCE_COLUMNS = [
+    ('Vehicle VIN*', 'VIN of the vehicle (must match Vehicles sheet)', 20),
+    ('Maintenance Type*', 'Type of service performed', 18),
+    ('Service Date*', 'Date of service (YYYY-MM-DD)', 15),
+    ('Mileage at Service*', 'Odometer reading at service', 18),
+    ('Cost', 'Total cost of service ($)', 12),
+    ('Service Provider', 'Name of service provider/shop', 25),
+    ('Notes', 'Additional notes or details', 40),
+    ('Next Service Due', 'Date of next service (YYYY-MM-DD)', 18),
+    ('Next Service Mileage', 'Mileage for next service', 18),
+]
+
+# The template's example rows, skipped when a filled-in template is imported
+EXAMPLE_VIN = '1FTYR1ZM5HKB10739'
+EXAMPLE_MAINTENANCE_TYPES = frozenset({'Oil Change', 'Tire Rotation', 'Brake Inspection'})
+EXAMPLE_SERVICE_MONTHS = ('2024-01', '2024-02')
+# Kept in order for the validation message
+VALID_STATUSES = ('Active', 'In Maintenance', 'Retired')
+# Validation stops after this many row errors; the preview can't be imported with any errors anyway
+MAX_ERRORS = 500
+# str.translate table dropping currency formatting from cost cells
+MONEY_CHARS = str.maketrans('', '', '$,')
+
+# Template styles, shared by every cell that uses them
+HEADER_FONT = Font(bold=True, color='FFFFFF', size=11)
+HEADER_FILL = PatternFill(start_color='012638', end_color='012638', fill_type='solid')
+HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='center', wrap_text=True)
+THIN_BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+# Optional field styling (lighter header)
+OPTIONAL_FILL = PatternFill(start_color='76777B', end_color='76777B', fill_type='solid')
+# Example row styling
+EXAMPLE_FILL = PatternFill(start_color='E8F4EA', end_color='E8F4EA', fill_type='solid')
+EXAMPLE_FONT = Font(italic=True, color='666666')
+TITLE_FONT = Font(bold=True, size=16, color='012638')
+SECTION_FONT = Font(bold=True, size=12, color='012638')
+
+
+def styled_cell(ws, value, font=None, fill=None, border=None, alignment=None):
+    """WriteOnlyCell carrying the given shared styles"""
+    cell = WriteOnlyCell(ws, value=value)
+    if font:
+        cell.font = font
+    if fill:
+        cell.fill = fill
+    if border:
+        cell.border = border
+    if alignment:
+        cell.alignment = alignment
+    return cell
+
+
+def write_column_headers(ws, columns):
+    """Column widths, then the header row with each description as a comment, for a write-only sheet"""
+    # Column widths must be set before the first row is written
+    for col, (_, _, width) in enumerate(columns, 1):
+        ws.column_dimensions[get_column_letter(col)].width = width
+    row = []
+    for header, description, _ in columns:
+        cell = styled_cell(ws, header, HEADER_FONT, HEADER_FILL if '*' in header else OPTIONAL_FILL, THIN_BORDER, HEADER_ALIGNMENT)
+        cell.comment = Comment(description, 'Fleet Manager')
+        row.append(cell)
+    ws.append(row)
 
 
 def create_fleet_template():
@@ -19,60 +105,72 @@ def create_fleet_template():
     
     Returns: BytesIO object containing the Excel file
     """
-    wb = Workbook()
+    # Write-only mode streams rows to the file; sheets are created in their final order
+    wb = Workbook(write_only=True)
     
-    # Styling
-    header_font = Font(bold=True, color='FFFFFF', size=11)
-    header_fill = PatternFill(start_color='012638', end_color='012638', fill_type='solid')
-    header_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
+    # ===== INSTRUCTIONS SHEET =====
+    ws_instructions = wb.create_sheet("Instructions")
+    ws_instructions.column_dimensions['A'].width = 70
     
-    # Optional field styling (lighter header)
-    optional_fill = PatternFill(start_color='76777B', end_color='76777B', fill_type='solid')
+    instructions = [
+        "Fleet Data Import Template",
+        "",
+        "INSTRUCTIONS:",
+        "1. Fill in your vehicle data in the 'Vehicles' sheet",
+        "2. Fill in maintenance records in the 'Maintenance Records' sheet",
+        "3. Fields marked with * are required",
+        "4. Delete the example rows (highlighted in green) before importing",
+        "5. Save the file and upload it to the Fleet Manager",
+        "",
+        "IMPORTANT NOTES:",
+        "• Hover over a column header to see what it should contain",
+        "• VINs must be unique and exactly 17 characters",
+        "• License plates must be unique",
+        "• Dates must be in YYYY-MM-DD format (e.g., 2024-01-15)",
+        "• Maintenance records must reference a valid VIN from the Vehicles sheet",
+        "• Cost values should be numbers only (no $ symbol)",
+        "",
+        "VEHICLE STATUS OPTIONS:",
+        "• Active - Vehicle is in regular use",
+        "• In Maintenance - Vehicle is currently being serviced",
+        "• Retired - Vehicle is no longer in service",
+        "",
+        "MAINTENANCE TYPES:",
+        "• Oil Change",
+        "• Tire Rotation",
+        "• Tire Replacement",
+        "• Brake Service",
+        "• Brake Inspection",
+        "• Inspection",
+        "• Repair",
+        "• Scheduled Maintenance",
+        "• Battery",
+        "• Transmission",
+        "• Engine",
+        "• Smog Check",
+        "• Registration",
+        "• Other",
+    ]
     
-    # Example row styling
-    example_fill = PatternFill(start_color='E8F4EA', end_color='E8F4EA', fill_type='solid')
-    example_font = Font(italic=True, color='666666')
+    for row_idx, text in enumerate(instructions, 1):
+        if row_idx == 1:
+            ws_instructions.append([styled_cell(ws_instructions, text, TITLE_FONT)])
+        elif text.endswith(':'):
+            ws_instructions.append([styled_cell(ws_instructions, text, SECTION_FONT)])
+        else:
+            ws_instructions.append([text])
     
     # ===== VEHICLES SHEET =====
-    ws_vehicles = wb.active
-    ws_vehicles.title = "Vehicles"
+    ws_vehicles = wb.create_sheet("Vehicles")
     
-    # Vehicle columns with descriptions
-    vehicle_columns = [
-        ('VIN*', 'Vehicle Identification Number (17 characters)', 20),
-        ('Make*', 'Vehicle manufacturer (e.g., Ford, Toyota)', 15),
-        ('Model*', 'Vehicle model (e.g., Transit 250)', 20),
-        ('Year*', 'Model year (e.g., 2024)', 10),
-        ('License Plate*', 'License plate number', 15),
-        ('Purchase Date*', 'Date purchased (YYYY-MM-DD)', 15),
-        ('Current Mileage', 'Current odometer reading', 15),
-        ('Status', 'Active, In Maintenance, or Retired', 15),
-        ('Assigned Driver', 'Driver name', 20),
-    ]
     
-    # Write vehicle headers
-    for col, (header, description, width) in enumerate(vehicle_columns, 1):
-        cell = ws_vehicles.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill if '*' in header else optional_fill
-        cell.alignment = header_alignment
-        cell.border = thin_border
-        ws_vehicles.column_dimensions[get_column_letter(col)].width = width
-        
-        # Add description row
-        desc_cell = ws_vehicles.cell(row=2, column=col, value=description)
-        desc_cell.font = Font(italic=True, size=9, color='666666')
-        desc_cell.alignment = Alignment(wrap_text=True)
+    # Freeze header row
+    ws_vehicles.freeze_panes = 'A2'
+    write_column_headers(ws_vehicles, VEHICLE_COLUMNS)
     
     # Add example row
     example_vehicle = [
-        '1FTYR1ZM5HKB10739',  # VIN
+        EXAMPLE_VIN,          # VIN
         'Ford',               # Make
         'Transit 250',        # Model
         2024,                 # Year
@@ -82,12 +180,7 @@ def create_fleet_template():
         'Active',             # Status
         'John Smith',         # Assigned Driver
     ]
-    
-    for col, value in enumerate(example_vehicle, 1):
-        cell = ws_vehicles.cell(row=3, column=col, value=value)
-        cell.fill = example_fill
-        cell.font = example_font
-        cell.border = thin_border
+    ws_vehicles.append([styled_cell(ws_vehicles, value, EXAMPLE_FONT, EXAMPLE_FILL, THIN_BORDER) for value in example_vehicle])
     
     # Add status dropdown validation
     status_validation = DataValidation(
@@ -97,41 +190,16 @@ def create_fleet_template():
     )
     status_validation.error = 'Please select a valid status'
     status_validation.errorTitle = 'Invalid Status'
-    ws_vehicles.add_data_validation(status_validation)
-    status_validation.add('H3:H1000')  # Status column
-    
-    # Freeze header rows
-    ws_vehicles.freeze_panes = 'A3'
+    status_validation.add('H2:H1000')  # Status column
+    ws_vehicles.data_validations.append(status_validation)
     
     # ===== MAINTENANCE RECORDS SHEET =====
     ws_maintenance = wb.create_sheet("Maintenance Records")
     
-    # Maintenance columns with descriptions
-    maintenance_columns = [
-        ('Vehicle VIN*', 'VIN of the vehicle (must match Vehicles sheet)', 20),
-        ('Maintenance Type*', 'Type of service performed', 18),
-        ('Service Date*', 'Date of service (YYYY-MM-DD)', 15),
-        ('Mileage at Service*', 'Odometer reading at service', 18),
-        ('Cost', 'Total cost of service ($)', 12),
-        ('Service Provider', 'Name of service provider/shop', 25),
-        ('Notes', 'Additional notes or details', 40),
-        ('Next Service Due', 'Date of next service (YYYY-MM-DD)', 18),
-        ('Next Service Mileage', 'Mileage for next service', 18),
-    ]
     
-    # Write maintenance headers
-    for col, (header, description, width) in enumerate(maintenance_columns, 1):
-        cell = ws_maintenance.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill if '*' in header else optional_fill
-        cell.alignment = header_alignment
-        cell.border = thin_border
-        ws_maintenance.column_dimensions[get_column_letter(col)].width = width
-        
-        # Add description row
-        desc_cell = ws_maintenance.cell(row=2, column=col, value=description)
-        desc_cell.font = Font(italic=True, size=9, color='666666')
-        desc_cell.alignment = Alignment(wrap_text=True)
+    # Freeze header row
+    ws_maintenance.freeze_panes = 'A2'
+    write_column_headers(ws_maintenance, MAINTENANCE_COLUMNS)
     
     # Add example rows
     example_maintenance = [
@@ -140,12 +208,8 @@ def create_fleet_template():
         ['1FTYR1ZM5HKB10739', 'Brake Inspection', '2024-02-15', 16200, 0.00, 'Dealer Service', 'Brakes at 60% life', '2024-08-15', ''],
     ]
     
-    for row_idx, row_data in enumerate(example_maintenance, 3):
-        for col, value in enumerate(row_data, 1):
-            cell = ws_maintenance.cell(row=row_idx, column=col, value=value)
-            cell.fill = example_fill
-            cell.font = example_font
-            cell.border = thin_border
+    for row_data in example_maintenance:
+        ws_maintenance.append([styled_cell(ws_maintenance, value, EXAMPLE_FONT, EXAMPLE_FILL, THIN_BORDER) for value in row_data])
     
     # Add maintenance type dropdown validation
     maintenance_types = '"Oil Change,Tire Rotation,Tire Replacement,Brake Service,Brake Inspection,Inspection,Repair,Scheduled Maintenance,Battery,Transmission,Engine,Smog Check,Registration,Other"'
@@ -156,69 +220,8 @@ def create_fleet_template():
     )
     type_validation.error = 'Please select a maintenance type'
     type_validation.errorTitle = 'Invalid Type'
-    ws_maintenance.add_data_validation(type_validation)
-    type_validation.add('B3:B1000')  # Maintenance Type column
-    
-    # Freeze header rows
-    ws_maintenance.freeze_panes = 'A3'
-    
-    # ===== INSTRUCTIONS SHEET =====
-    ws_instructions = wb.create_sheet("Instructions")
-    
-    instructions = [
-        ("Fleet Data Import Template", None),
-        ("", None),
-        ("INSTRUCTIONS:", None),
-        ("1. Fill in your vehicle data in the 'Vehicles' sheet", None),
-        ("2. Fill in maintenance records in the 'Maintenance Records' sheet", None),
-        ("3. Fields marked with * are required", None),
-        ("4. Delete the example rows (highlighted in green) before importing", None),
-        ("5. Save the file and upload it to the Fleet Manager", None),
-        ("", None),
-        ("IMPORTANT NOTES:", None),
-        ("• VINs must be unique and exactly 17 characters", None),
-        ("• License plates must be unique", None),
-        ("• Dates must be in YYYY-MM-DD format (e.g., 2024-01-15)", None),
-        ("• Maintenance records must reference a valid VIN from the Vehicles sheet", None),
-        ("• Cost values should be numbers only (no $ symbol)", None),
-        ("", None),
-        ("VEHICLE STATUS OPTIONS:", None),
-        ("• Active - Vehicle is in regular use", None),
-        ("• In Maintenance - Vehicle is currently being serviced", None),
-        ("• Retired - Vehicle is no longer in service", None),
-        ("", None),
-        ("MAINTENANCE TYPES:", None),
-        ("• Oil Change", None),
-        ("• Tire Rotation", None),
-        ("• Tire Replacement", None),
-        ("• Brake Service", None),
-        ("• Brake Inspection", None),
-        ("• Inspection", None),
-        ("• Repair", None),
-        ("• Scheduled Maintenance", None),
-        ("• Battery", None),
-        ("• Transmission", None),
-        ("• Engine", None),
-        ("• Smog Check", None),
-        ("• Registration", None),
-        ("• Other", None),
-    ]
-    
-    # Write instructions
-    title_font = Font(bold=True, size=16, color='012638')
-    section_font = Font(bold=True, size=12, color='012638')
-    
-    for row_idx, (text, _) in enumerate(instructions, 1):
-        cell = ws_instructions.cell(row=row_idx, column=1, value=text)
-        if row_idx == 1:
-            cell.font = title_font
-        elif text.endswith(':'):
-            cell.font = section_font
-    
-    ws_instructions.column_dimensions['A'].width = 70
-    
-    # Move Instructions to first position
-    wb.move_sheet(ws_instructions, offset=-2)
+    type_validation.add('B2:B1000')  # Maintenance Type column
+    ws_maintenance.data_validations.append(type_validation)
     
     # Save to BytesIO
     output = io.BytesIO()
@@ -228,6 +231,54 @@ def create_fleet_template():
     return output
 
 
+@dataclass(slots=True)
+class ParsedVehicle:
+    """One Vehicles sheet row, validated and converted by parse_excel_import()"""
+    vin: str
+    make: str
+    model: str
+    year: int
+    license_plate: str
+    purchase_date: date
+    current_mileage: int
+    status: str
+    assigned_driver: str
+    row: int
+
+
+@dataclass(slots=True)
+class ParsedMaintenance:
+    """One Maintenance Records sheet row, validated and converted by parse_excel_import()"""
+    vehicle_vin: str
+    maintenance_type: str
+    service_date: date
+    mileage_at_service: int
+    cost: float
+    service_provider: str
+    notes: str
+    next_service_due: Optional[date]
+    next_service_mileage: Optional[int]
+    row: int
+
+
+def parse_iso_date(text):
+    """date from a YYYY-MM-DD string; raises ValueError if it isn't one"""
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        # fromisoformat needs zero-padded fields; keep accepting dates like 2024-1-5
+        return datetime.strptime(text, '%Y-%m-%d').date()
+
+
+def add_row_error(result, message):
+    """Record a row error; True once MAX_ERRORS is reached and parsing should stop"""
+    result['errors'].append(message)
+    if len(result['errors']) < MAX_ERRORS:
+        return False
+    result['errors'].append(f"Stopped checking after {MAX_ERRORS} errors - fix these and upload again")
+    return True
+
+
 def parse_excel_import(file_stream):
     """
     Parses an uploaded Excel file and extracts vehicle and maintenance data.
@@ -246,96 +297,105 @@ def parse_excel_import(file_stream):
     }
     
     try:
-        wb = load_workbook(file_stream)
+        # Read-only mode streams rows instead of building every cell and style up front
+        wb = load_workbook(file_stream, read_only=True, data_only=True)
     except Exception as e:
         result['errors'].append(f"Could not read Excel file: {str(e)}")
         return result
     
+    # VINs of the valid vehicles, for cross-checking maintenance records
+    valid_vins = set()
+    
     # ===== PARSE VEHICLES =====
     if 'Vehicles' in wb.sheetnames:
         ws = wb['Vehicles']
         
-        # Find the data starting row (skip header and description rows)
-        for row_idx in range(3, ws.max_row + 1):
+        # Data starts on row 2, below the header
+        for row_idx, (vin, make, model, year, plate, purchase_date, mileage, status, driver) in enumerate(
+            ws.iter_rows(min_row=2, max_col=9, values_only=True), start=2
+        ):
             # Skip empty rows
-            vin = ws.cell(row=row_idx, column=1).value
-            if not vin or str(vin).strip() == '':
+            vin = str(vin or '').strip()
+            if not vin:
                 continue
             
-            # Skip example row (check if it's the example VIN)
-            if str(vin).strip() == '1FTYR1ZM5HKB10739':
-                # Check if it's the example by looking at other fields
-                make = ws.cell(row=row_idx, column=2).value
-                model = ws.cell(row=row_idx, column=3).value
-                if make == 'Ford' and model == 'Transit 250':
-                    result['warnings'].append(f"Row {row_idx}: Skipped example row")
-                    continue
+            # Templates downloaded before descriptions moved into header comments still have a description row
+            if row_idx == 2 and vin == VEHICLE_COLUMNS[0][1]:
+                continue
             
-            vehicle = {
-                'vin': str(vin).strip().upper(),
-                'make': str(ws.cell(row=row_idx, column=2).value or '').strip(),
-                'model': str(ws.cell(row=row_idx, column=3).value or '').strip(),
-                'year': ws.cell(row=row_idx, column=4).value,
-                'license_plate': str(ws.cell(row=row_idx, column=5).value or '').strip().upper(),
-                'purchase_date': ws.cell(row=row_idx, column=6).value,
-                'current_mileage': ws.cell(row=row_idx, column=7).value or 0,
-                'status': str(ws.cell(row=row_idx, column=8).value or 'Active').strip(),
-                'assigned_driver': str(ws.cell(row=row_idx, column=9).value or '').strip(),
-                'row': row_idx
-            }
+            # Skip example row (the example VIN with the example make and model)
+            if vin == EXAMPLE_VIN and make == 'Ford' and model == 'Transit 250':
+                result['warnings'].append(f"Row {row_idx}: Skipped example row")
+                continue
+            
+            vehicle = ParsedVehicle(
+                vin=vin.upper(),
+                make=str(make or '').strip(),
+                model=str(model or '').strip(),
+                year=year,
+                license_plate=str(plate or '').strip().upper(),
+                purchase_date=purchase_date,
+                current_mileage=mileage or 0,
+                status=str(status or 'Active').strip(),
+                assigned_driver=str(driver or '').strip(),
+                row=row_idx
+            )
             
             # Validate required fields
             errors = []
-            if not vehicle['vin']:
+            if not vehicle.vin:
                 errors.append("VIN is required")
-            elif len(vehicle['vin']) != 17:
-                errors.append(f"VIN must be 17 characters (got {len(vehicle['vin'])})")
+            elif len(vehicle.vin) != 17:
+                errors.append(f"VIN must be 17 characters (got {len(vehicle.vin)})")
             
-            if not vehicle['make']:
+            if not vehicle.make:
                 errors.append("Make is required")
-            if not vehicle['model']:
+            if not vehicle.model:
                 errors.append("Model is required")
-            if not vehicle['year']:
+            if not vehicle.year:
                 errors.append("Year is required")
-            elif not isinstance(vehicle['year'], int):
+            elif not isinstance(vehicle.year, int):
                 try:
-                    vehicle['year'] = int(vehicle['year'])
+                    vehicle.year = int(vehicle.year)
                 except:
                     errors.append("Year must be a number")
             
-            if not vehicle['license_plate']:
+            if not vehicle.license_plate:
                 errors.append("License plate is required")
             
-            if not vehicle['purchase_date']:
+            if not vehicle.purchase_date:
                 errors.append("Purchase date is required")
             else:
                 # Parse date
-                if isinstance(vehicle['purchase_date'], datetime):
-                    vehicle['purchase_date'] = vehicle['purchase_date'].date()
-                elif isinstance(vehicle['purchase_date'], str):
+                if isinstance(vehicle.purchase_date, datetime):
+                    vehicle.purchase_date = vehicle.purchase_date.date()
+                elif isinstance(vehicle.purchase_date, str):
                     try:
-                        vehicle['purchase_date'] = datetime.strptime(vehicle['purchase_date'], '%Y-%m-%d').date()
+                        vehicle.purchase_date = parse_iso_date(vehicle.purchase_date)
                     except:
                         errors.append("Purchase date must be in YYYY-MM-DD format")
             
             # Parse mileage
-            if vehicle['current_mileage']:
+            if vehicle.current_mileage:
                 try:
-                    vehicle['current_mileage'] = int(vehicle['current_mileage'])
+                    vehicle.current_mileage = int(vehicle.current_mileage)
                 except:
                     errors.append("Mileage must be a number")
             else:
-                vehicle['current_mileage'] = 0
+                vehicle.current_mileage = 0
             
             # Validate status
-            valid_statuses = ['Active', 'In Maintenance', 'Retired']
-            if vehicle['status'] not in valid_statuses:
-                errors.append(f"Status must be one of: {', '.join(valid_statuses)}")
+            if vehicle.status not in VALID_STATUSES:
+                errors.append(f"Status must be one of: {', '.join(VALID_STATUSES)}")
             
             if errors:
-                result['errors'].append(f"Row {row_idx} (VIN: {vehicle['vin']}): {'; '.join(errors)}")
+                if add_row_error(result, f"Row {row_idx} (VIN: {vehicle.vin}): {'; '.join(errors)}"):
+                    # Nothing can be imported once the limit is hit, so the maintenance sheet isn't read at all
+                    wb.close()
+                    return result
             else:
                 result['vehicles'].append(vehicle)
+                valid_vins.add(vehicle.vin)
     else:
         result['errors'].append("'Vehicles' sheet not found in Excel file")
     
@@ -343,103 +403,111 @@ def parse_excel_import(file_stream):
     if 'Maintenance Records' in wb.sheetnames:
         ws = wb['Maintenance Records']
         
-        # Get list of valid VINs from parsed vehicles
-        valid_vins = {v['vin'] for v in result['vehicles']}
-        
-        for row_idx in range(3, ws.max_row + 1):
+        for row_idx, (vin, maint_type, service_date, mileage, cost, provider, notes, next_due, next_mileage) in enumerate(
+            ws.iter_rows(min_row=2, max_col=9, values_only=True), start=2
+        ):
             # Skip empty rows
-            vin = ws.cell(row=row_idx, column=1).value
-            if not vin or str(vin).strip() == '':
+            vin = str(vin or '').strip().upper()
+            if not vin:
+                continue
+            
+            # Description row of older templates
+            if row_idx == 2 and vin == MAINTENANCE_COLUMNS[0][1].upper():
                 continue
             
             # Skip example rows
-            if str(vin).strip().upper() == '1FTYR1ZM5HKB10739':
-                maint_type = ws.cell(row=row_idx, column=2).value
-                if maint_type in ['Oil Change', 'Tire Rotation', 'Brake Inspection']:
-                    service_date = ws.cell(row=row_idx, column=3).value
-                    if service_date and ('2024-01' in str(service_date) or '2024-02' in str(service_date)):
-                        result['warnings'].append(f"Maintenance Row {row_idx}: Skipped example row")
-                        continue
+            if vin == EXAMPLE_VIN and maint_type in EXAMPLE_MAINTENANCE_TYPES and service_date:
+                service_month = str(service_date)
+                if any(month in service_month for month in EXAMPLE_SERVICE_MONTHS):
+                    result['warnings'].append(f"Maintenance Row {row_idx}: Skipped example row")
+                    continue
             
-            record = {
-                'vehicle_vin': str(vin).strip().upper(),
-                'maintenance_type': str(ws.cell(row=row_idx, column=2).value or '').strip(),
-                'service_date': ws.cell(row=row_idx, column=3).value,
-                'mileage_at_service': ws.cell(row=row_idx, column=4).value,
-                'cost': ws.cell(row=row_idx, column=5).value or 0,
-                'service_provider': str(ws.cell(row=row_idx, column=6).value or '').strip(),
-                'notes': str(ws.cell(row=row_idx, column=7).value or '').strip(),
-                'next_service_due': ws.cell(row=row_idx, column=8).value,
-                'next_service_mileage': ws.cell(row=row_idx, column=9).value,
-                'row': row_idx
-            }
+            record = ParsedMaintenance(
+                vehicle_vin=vin,
+                maintenance_type=str(maint_type or '').strip(),
+                service_date=service_date,
+                mileage_at_service=mileage,
+                cost=cost or 0,
+                service_provider=str(provider or '').strip(),
+                notes=str(notes or '').strip(),
+                next_service_due=next_due,
+                next_service_mileage=next_mileage,
+                row=row_idx
+            )
             
             # Validate required fields
             errors = []
             
-            if not record['vehicle_vin']:
+            if not record.vehicle_vin:
                 errors.append("Vehicle VIN is required")
-            elif record['vehicle_vin'] not in valid_vins:
-                errors.append(f"VIN '{record['vehicle_vin']}' not found in Vehicles sheet")
+            elif record.vehicle_vin not in valid_vins:
+                errors.append(f"VIN '{record.vehicle_vin}' not found in Vehicles sheet")
             
-            if not record['maintenance_type']:
+            if not record.maintenance_type:
                 errors.append("Maintenance type is required")
             
-            if not record['service_date']:
+            if not record.service_date:
                 errors.append("Service date is required")
             else:
-                if isinstance(record['service_date'], datetime):
-                    record['service_date'] = record['service_date'].date()
-                elif isinstance(record['service_date'], str):
+                if isinstance(record.service_date, datetime):
+                    record.service_date = record.service_date.date()
+                elif isinstance(record.service_date, str):
                     try:
-                        record['service_date'] = datetime.strptime(record['service_date'], '%Y-%m-%d').date()
+                        record.service_date = parse_iso_date(record.service_date)
                     except:
                         errors.append("Service date must be in YYYY-MM-DD format")
             
-            if not record['mileage_at_service']:
+            if not record.mileage_at_service:
                 errors.append("Mileage at service is required")
             else:
                 try:
-                    record['mileage_at_service'] = int(record['mileage_at_service'])
+                    record.mileage_at_service = int(record.mileage_at_service)
                 except:
                     errors.append("Mileage must be a number")
             
             # Parse optional fields
-            if record['cost']:
+            if record.cost:
                 try:
-                    record['cost'] = float(str(record['cost']).replace('$', '').replace(',', ''))
+                    # Numeric cells need no string round trip; text like "$1,234.50" loses its $ and commas in one pass
+                    if isinstance(record.cost, (int, float)):
+                        record.cost = float(record.cost)
+                    else:
+                        record.cost = float(str(record.cost).translate(MONEY_CHARS))
                 except:
                     errors.append("Cost must be a number")
             else:
-                record['cost'] = 0.0
+                record.cost = 0.0
             
-            if record['next_service_due']:
-                if isinstance(record['next_service_due'], datetime):
-                    record['next_service_due'] = record['next_service_due'].date()
-                elif isinstance(record['next_service_due'], str):
+            if record.next_service_due:
+                if isinstance(record.next_service_due, datetime):
+                    record.next_service_due = record.next_service_due.date()
+                elif isinstance(record.next_service_due, str):
                     try:
-                        record['next_service_due'] = datetime.strptime(record['next_service_due'], '%Y-%m-%d').date()
+                        record.next_service_due = parse_iso_date(record.next_service_due)
                     except:
-                        record['next_service_due'] = None
+                        record.next_service_due = None
                         result['warnings'].append(f"Maintenance Row {row_idx}: Invalid next service date format, skipping")
             else:
-                record['next_service_due'] = None
+                record.next_service_due = None
             
-            if record['next_service_mileage']:
+            if record.next_service_mileage:
                 try:
-                    record['next_service_mileage'] = int(record['next_service_mileage'])
+                    record.next_service_mileage = int(record.next_service_mileage)
                 except:
-                    record['next_service_mileage'] = None
+                    record.next_service_mileage = None
             else:
-                record['next_service_mileage'] = None
+                record.next_service_mileage = None
             
             if errors:
-                result['errors'].append(f"Maintenance Row {row_idx}: {'; '.join(errors)}")
+                if add_row_error(result, f"Maintenance Row {row_idx}: {'; '.join(errors)}"):
+                    break
             else:
                 result['maintenance'].append(record)
     else:
         result['warnings'].append("'Maintenance Records' sheet not found - no maintenance records will be imported")
     
+    # Read-only workbooks keep the file open until closed
+    wb.close()
     return result
 
 
@@ -466,83 +534,82 @@ def import_data_to_db(parsed_data, db, Vehicle, MaintenanceRecord, clear_existin
     }
     
     try:
+        # Cleared rows are committed together with the import, so a failed import keeps the old data
         if clear_existing:
             MaintenanceRecord.query.delete()
             Vehicle.query.delete()
-            db.session.commit()
         
-        # Create a mapping of VIN to vehicle ID for maintenance records
+        # Map existing vehicles by VIN and plate with a single query
         vin_to_id = {}
+        existing_plates = set()
+        for vehicle_id, vin, plate in db.session.query(Vehicle.id, Vehicle.vin, Vehicle.license_plate):
+            vin_to_id[vin] = vehicle_id
+            existing_plates.add(plate)
         
-        # First, check for existing vehicles
-        existing_vins = {v.vin for v in Vehicle.query.all()}
-        existing_plates = {v.license_plate for v in Vehicle.query.all()}
-        
-        # Import vehicles
+        # Collect new vehicles as plain rows for a single batched insert
+        vehicle_rows = []
+        pending_vins = set()
         for v_data in parsed_data['vehicles']:
             # Skip if VIN already exists (unless clearing)
-            if v_data['vin'] in existing_vins and not clear_existing:
+            if v_data.vin in vin_to_id or v_data.vin in pending_vins:
                 result['warnings'] = result.get('warnings', [])
-                result['warnings'].append(f"Vehicle with VIN {v_data['vin']} already exists - skipped")
+                result['warnings'].append(f"Vehicle with VIN {v_data.vin} already exists - skipped")
                 result['vehicles_skipped'] += 1
-                # Still add to mapping for maintenance records
-                existing_vehicle = Vehicle.query.filter_by(vin=v_data['vin']).first()
-                if existing_vehicle:
-                    vin_to_id[v_data['vin']] = existing_vehicle.id
                 continue
             
             # Skip if license plate already exists
-            if v_data['license_plate'] in existing_plates and not clear_existing:
-                result['errors'].append(f"Vehicle with license plate {v_data['license_plate']} already exists - skipped")
+            if v_data.license_plate in existing_plates:
+                result['errors'].append(f"Vehicle with license plate {v_data.license_plate} already exists - skipped")
                 result['vehicles_skipped'] += 1
                 continue
             
-            vehicle = Vehicle(
-                vin=v_data['vin'],
-                make=v_data['make'],
-                model=v_data['model'],
-                year=v_data['year'],
-                license_plate=v_data['license_plate'],
-                purchase_date=v_data['purchase_date'],
-                current_mileage=v_data['current_mileage'],
-                status=v_data['status'],
-                assigned_driver=v_data['assigned_driver'] if v_data['assigned_driver'] else None
-            )
-            
-            db.session.add(vehicle)
-            db.session.flush()  # Get the ID
-            vin_to_id[v_data['vin']] = vehicle.id
-            existing_vins.add(v_data['vin'])
-            existing_plates.add(v_data['license_plate'])
-            result['vehicles_added'] += 1
+            vehicle_rows.append({
+                'vin': v_data.vin,
+                'make': v_data.make,
+                'model': v_data.model,
+                'year': v_data.year,
+                'license_plate': v_data.license_plate,
+                'purchase_date': v_data.purchase_date,
+                'current_mileage': v_data.current_mileage,
+                'status': v_data.status,
+                'assigned_driver': v_data.assigned_driver if v_data.assigned_driver else None
+            })
+            pending_vins.add(v_data.vin)
+            existing_plates.add(v_data.license_plate)
         
-        # Also map existing vehicles for maintenance records
-        for vehicle in Vehicle.query.all():
-            if vehicle.vin not in vin_to_id:
-                vin_to_id[vehicle.vin] = vehicle.id
+        if vehicle_rows:
+            db.session.execute(insert(Vehicle), vehicle_rows)
+            result['vehicles_added'] = len(vehicle_rows)
+            
+            # Fetch the new IDs for the maintenance records
+            vin_to_id.update(
+                db.session.query(Vehicle.vin, Vehicle.id).filter(Vehicle.vin.in_(pending_vins)).all()
+            )
         
         # Import maintenance records
+        maintenance_rows = []
         for m_data in parsed_data['maintenance']:
-            vehicle_id = vin_to_id.get(m_data['vehicle_vin'])
+            vehicle_id = vin_to_id.get(m_data.vehicle_vin)
             
             if not vehicle_id:
-                result['errors'].append(f"Could not find vehicle for VIN {m_data['vehicle_vin']}")
+                result['errors'].append(f"Could not find vehicle for VIN {m_data.vehicle_vin}")
                 continue
             
-            record = MaintenanceRecord(
-                vehicle_id=vehicle_id,
-                maintenance_type=m_data['maintenance_type'],
-                service_date=m_data['service_date'],
-                mileage_at_service=m_data['mileage_at_service'],
-                cost=m_data['cost'],
-                service_provider=m_data['service_provider'] if m_data['service_provider'] else None,
-                notes=m_data['notes'] if m_data['notes'] else None,
-                next_service_due=m_data['next_service_due'],
-                next_service_mileage=m_data['next_service_mileage']
-            )
-            
-            db.session.add(record)
-            result['maintenance_added'] += 1
+            maintenance_rows.append({
+                'vehicle_id': vehicle_id,
+                'maintenance_type': m_data.maintenance_type,
+                'service_date': m_data.service_date,
+                'mileage_at_service': m_data.mileage_at_service,
+                'cost': m_data.cost,
+                'service_provider': m_data.service_provider if m_data.service_provider else None,
+                'notes': m_data.notes if m_data.notes else None,
+                'next_service_due': m_data.next_service_due,
+                'next_service_mileage': m_data.next_service_mileage
+            })
+        
+        if maintenance_rows:
+            db.session.execute(insert(MaintenanceRecord), maintenance_rows)
+            result['maintenance_added'] = len(maintenance_rows)
         
         db.session.commit()
         
@@ -0,0 +1,23 @@
+"""
+Gunicorn settings for hosts that run the app under gunicorn (Heroku, Railway, a VPS)
+Usage: gunicorn -c gunicorn.conf.py app:app
+PythonAnywhere serves the app through wsgi.py instead and ignores this file.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+
+# Requests spend most of their time waiting on SQLite, OCR or OpenAI, so threads overlap them within a worker
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 5))
+
+# Import the app once in the master so workers share its modules copy-on-write
+preload_app = True
+
+
+def post_fork(server, worker):
+    """Drop pooled SQLite connections inherited from the master; each worker opens its own"""
+    from app import app, db
+    with app.app_context():
+        db.engine.dispose(close=False)
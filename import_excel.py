@@ -1,90 +1,22 @@
+from collections import namedtuple
 from datetime import datetime
 from app import app, db, Vehicle, MaintenanceRecord
 
+# One seed vehicle; num is the fleet number from the spreadsheet
+VehicleRow = namedtuple('VehicleRow', 'num driver miles year make model vin license')
+
 # Complete vehicle data from the Fleet Info spreadsheet
-VEHICLE_DATA = {
-    '06': {
-        'driver': 'Ryan',
-        'miles': 99325,
-        'year': 2017,
-        'make': 'Ford',
-        'model': 'Transit 250',
-        'vin': '1FTYR1ZM5HKB10739',
-        'license': '8JMJ131'
-    },
-    '07': {
-        'driver': 'Triston',
-        'miles': 171222,
-        'year': 2016,
-        'make': 'Ford',
-        'model': 'Transit Connect Cargo',
-        'vin': 'NM0LS7E74G1268749',
-        'license': '04236W2'
-    },
-    '08': {
-        'driver': 'Extra',
-        'miles': 85472,
-        'year': 2018,
-        'make': 'Ford',
-        'model': 'Transit Connect Passenger',
-        'vin': 'NM0GS9F74J1365730',
-        'license': '8DQR194'
-    },
-    '09': {
-        'driver': 'Alexx',
-        'miles': 79000,
-        'year': 2017,
-        'make': 'Mercedes',
-        'model': 'Sprinter 2500',
-        'vin': 'WD4PE8CD2HP551309',
-        'license': '8USN020'
-    },
-    '10': {
-        'driver': 'Andrew',
-        'miles': 89978,
-        'year': 2021,
-        'make': 'Ford',
-        'model': 'Transit Connect Cargo',
-        'vin': 'NM0LS7E23M1492076',
-        'license': '44695D3'
-    },
-    '11': {
-        'driver': 'Jeremy',
-        'miles': 72032,
-        'year': 2020,
-        'make': 'Toyota',
-        'model': 'Prius XLE',
-        'vin': 'JTDKARFU9L3125473',
-        'license': '8ZER404'
-    },
-    '12': {
-        'driver': 'Mase',
-        'miles': 38076,
-        'year': 2022,
-        'make': 'Mercedes',
-        'model': 'Metris',
-        'vin': 'W1YV0CEY8N4202764',
-        'license': '31451T3'
-    },
-    '13': {
-        'driver': 'Mike',
-        'miles': 48674,
-        'year': 2022,
-        'make': 'Mercedes',
-        'model': 'Metris',
-        'vin': 'W1YV0CEY9N4184078',
-        'license': '3145013'
-    },
-    '00': {
-        'driver': 'Kyle',
-        'miles': 71277,
-        'year': 2017,
-        'make': 'Ford',
-        'model': 'F250',
-        'vin': '1FT7W2B62JEB29985',
-        'license': '16014L2'
-    }
-}
+VEHICLE_DATA = (
+    VehicleRow('06', 'Ryan', 99325, 2017, 'Ford', 'Transit 250', '1FTYR1ZM5HKB10739', '8JMJ131'),
+    VehicleRow('07', 'Triston', 171222, 2016, 'Ford', 'Transit Connect Cargo', 'NM0LS7E74G1268749', '04236W2'),
+    VehicleRow('08', 'Extra', 85472, 2018, 'Ford', 'Transit Connect Passenger', 'NM0GS9F74J1365730', '8DQR194'),
+    VehicleRow('09', 'Alexx', 79000, 2017, 'Mercedes', 'Sprinter 2500', 'WD4PE8CD2HP551309', '8USN020'),
+    VehicleRow('10', 'Andrew', 89978, 2021, 'Ford', 'Transit Connect Cargo', 'NM0LS7E23M1492076', '44695D3'),
+    VehicleRow('11', 'Jeremy', 72032, 2020, 'Toyota', 'Prius XLE', 'JTDKARFU9L3125473', '8ZER404'),
+    VehicleRow('12', 'Mase', 38076, 2022, 'Mercedes', 'Metris', 'W1YV0CEY8N4202764', '31451T3'),
+    VehicleRow('13', 'Mike', 48674, 2022, 'Mercedes', 'Metris', 'W1YV0CEY9N4184078', '3145013'),
+    VehicleRow('00', 'Kyle', 71277, 2017, 'Ford', 'F250', '1FT7W2B62JEB29985', '16014L2'),
+)
 
 def import_data():
     print(f"Importing accurate vehicle data from Fleet Info...\n")
@@ -93,28 +25,27 @@ def import_data():
         print("Clearing existing data...")
         MaintenanceRecord.query.delete()
         Vehicle.query.delete()
-        db.session.commit()
         
         print("\n=== Creating Vehicles ===")
-        vehicles = {}
-        for vehicle_num, data in VEHICLE_DATA.items():
-            vehicle = Vehicle(
-                vin=data['vin'],
-                make=data['make'],
-                model=data['model'],
-                year=data['year'],
-                license_plate=data['license'],
-                purchase_date=datetime(data['year'], 1, 1).date(),
-                current_mileage=data['miles'],
-                status='Active',
-                assigned_driver=data['driver']
-            )
-            db.session.add(vehicle)
-            vehicles[vehicle_num] = vehicle
-            print(f"  ✓ {data['year']} {data['make']} {data['model']} - {data['driver']} (VIN: {data['vin']}, License: {data['license']})")
+        rows = []
+        for vehicle in VEHICLE_DATA:
+            rows.append({
+                'vin': vehicle.vin,
+                'make': vehicle.make,
+                'model': vehicle.model,
+                'year': vehicle.year,
+                'license_plate': vehicle.license,
+                'purchase_date': datetime(vehicle.year, 1, 1).date(),
+                'current_mileage': vehicle.miles,
+                'status': 'Active',
+                'assigned_driver': vehicle.driver
+            })
+            print(f"  ✓ {vehicle.year} {vehicle.make} {vehicle.model} - {vehicle.driver} (VIN: {vehicle.vin}, License: {vehicle.license})")
         
+        # One executemany insert, committed together with the clear above
+        db.session.execute(db.insert(Vehicle), rows)
         db.session.commit()
-        print(f"\n✅ Created {len(vehicles)} vehicles")
+        print(f"\n✅ Created {len(rows)} vehicles")
         print(f"Total vehicles: {Vehicle.query.count()}")
 
 if __name__ == '__main__':
@@ -0,0 +1,55 @@
+"""
+Database migration script to add performance indexes and change tracking to the user and fleet tables
+Run this once on databases created before the indexes were added to the models
+(db.create_all() only creates indexes for brand new tables)
+"""
+from app import app, db, User, Vehicle, MaintenanceRecord, FleetVersion, create_vehicle_search_index
+
+def migrate_database():
+    with app.app_context():
+        try:
+            # Add updated_at change tracking, seeded from created_at
+            inspector = db.inspect(db.engine)
+            with db.engine.begin() as conn:
+                for table in (Vehicle.__table__, MaintenanceRecord.__table__):
+                    existing_columns = [col['name'] for col in inspector.get_columns(table.name)]
+                    if 'updated_at' not in existing_columns:
+                        print(f"➕ Adding 'updated_at' column to {table.name}...")
+                        conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN updated_at DATETIME')
+                        conn.exec_driver_sql(f'UPDATE {table.name} SET updated_at = created_at')
+            
+            # Counter row that versions cached pages (seeded by its after_create listener)
+            with db.engine.begin() as conn:
+                if not db.inspect(conn).has_table(FleetVersion.__tablename__):
+                    print("➕ Creating fleet_version table...")
+                    FleetVersion.__table__.create(bind=conn)
+            
+            # Create any model indexes that are missing from existing tables
+            print("🔍 Creating indexes...")
+            with db.engine.begin() as conn:
+                # Check sqlite_master by name: reflection skips the lower() expression indexes,
+                # so checkfirst would try to create them again on every rerun
+                existing_indexes = set(conn.exec_driver_sql(
+                    "SELECT name FROM sqlite_master WHERE type = 'index'"
+                ).scalars())
+                for table in (User.__table__, Vehicle.__table__, MaintenanceRecord.__table__):
+                    for index in table.indexes:
+                        if index.name in existing_indexes:
+                            continue
+                        print(f"   - {index.name}")
+                        index.create(bind=conn)
+            
+            # Full-text search index for the vehicle and maintenance searches
+            print("🔍 Building vehicle search index...")
+            with db.engine.begin() as conn:
+                create_vehicle_search_index(conn)
+            
+            print("✅ Migration completed successfully!")
+            print("   Restart the app so running workers pick up the search index.")
+            
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            raise
+
+if __name__ == '__main__':
+    migrate_database()
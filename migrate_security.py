@@ -8,48 +8,45 @@ from sqlalchemy import text
 def migrate_database():
     with app.app_context():
         try:
-            # Check if columns already exist
-            inspector = db.inspect(db.engine)
-            existing_columns = [col['name'] for col in inspector.get_columns('user')]
-            
-            print("📊 Existing columns:", existing_columns)
-            
-            # Add new columns if they don't exist
-            with db.engine.connect() as conn:
-                if 'is_active' not in existing_columns:
-                    print("➕ Adding 'is_active' column...")
-                    conn.execute(text('ALTER TABLE user ADD COLUMN is_active BOOLEAN DEFAULT 1'))
-                    conn.commit()
-                
-                if 'failed_login_attempts' not in existing_columns:
-                    print("➕ Adding 'failed_login_attempts' column...")
-                    conn.execute(text('ALTER TABLE user ADD COLUMN failed_login_attempts INTEGER DEFAULT 0'))
-                    conn.commit()
-                
-                if 'locked_until' not in existing_columns:
-                    print("➕ Adding 'locked_until' column...")
-                    conn.execute(text('ALTER TABLE user ADD COLUMN locked_until DATETIME'))
-                    conn.commit()
-                
-                if 'last_login_ip' not in existing_columns:
-                    print("➕ Adding 'last_login_ip' column...")
-                    conn.execute(text('ALTER TABLE user ADD COLUMN last_login_ip VARCHAR(45)'))
-                    conn.commit()
-            
-            # Create indexes for performance
-            print("🔍 Creating indexes...")
-            with db.engine.connect() as conn:
+            # pysqlite only opens a transaction before DML, so the ALTERs would each commit on their own;
+            # drive the transaction by hand so the DDL and the user backfill commit or roll back together
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.exec_driver_sql('BEGIN')
                 try:
+                    # Check if columns already exist
+                    existing_columns = [row[1] for row in conn.execute(text('PRAGMA table_info(user)'))]
+                    
+                    print("📊 Existing columns:", existing_columns)
+                    
+                    # Add new columns if they don't exist
+                    if 'is_active' not in existing_columns:
+                        print("➕ Adding 'is_active' column...")
+                        conn.execute(text('ALTER TABLE user ADD COLUMN is_active BOOLEAN DEFAULT 1'))
+                    
+                    if 'failed_login_attempts' not in existing_columns:
+                        print("➕ Adding 'failed_login_attempts' column...")
+                        conn.execute(text('ALTER TABLE user ADD COLUMN failed_login_attempts INTEGER DEFAULT 0'))
+                    
+                    if 'locked_until' not in existing_columns:
+                        print("➕ Adding 'locked_until' column...")
+                        conn.execute(text('ALTER TABLE user ADD COLUMN locked_until DATETIME'))
+                    
+                    if 'last_login_ip' not in existing_columns:
+                        print("➕ Adding 'last_login_ip' column...")
+                        conn.execute(text('ALTER TABLE user ADD COLUMN last_login_ip VARCHAR(45)'))
+                    
+                    # Create indexes for performance
+                    print("🔍 Creating indexes...")
                     conn.execute(text('CREATE INDEX IF NOT EXISTS idx_user_username ON user(username)'))
                     conn.execute(text('CREATE INDEX IF NOT EXISTS idx_user_email ON user(email)'))
-                    conn.commit()
-                except Exception as e:
-                    print(f"⚠️  Index creation skipped (may already exist): {e}")
-            
-            # Update all existing users to be active
-            print("✅ Setting all existing users to active...")
-            User.query.update({User.is_active: True, User.failed_login_attempts: 0})
-            db.session.commit()
+                    
+                    # Update all existing users to be active
+                    print("✅ Setting all existing users to active...")
+                    conn.execute(db.update(User).values(is_active=True, failed_login_attempts=0))
+                except Exception:
+                    conn.exec_driver_sql('ROLLBACK')
+                    raise
+                conn.exec_driver_sql('COMMIT')
             
             print("✅ Migration completed successfully!")
             print("🔐 Security features enabled:")
@@ -60,7 +57,6 @@ def migrate_database():
             
         except Exception as e:
             print(f"❌ Migration failed: {e}")
-            db.session.rollback()
             raise
 
 if __name__ == '__main__':
@@ -0,0 +1,54 @@
+"""
+Restore deleted fleet vehicles from the Fleet Info seed data
+Usage: python restore_vehicles.py 08 [09 ...]  (fleet numbers from import_excel.VEHICLE_DATA)
+"""
+import sys
+from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert
+from app import app, db, Vehicle
+from import_excel import VEHICLE_DATA
+
+def restore_vehicles(fleet_numbers):
+    candidates = [data for data in VEHICLE_DATA if data.num in fleet_numbers]
+
+    unknown = sorted(set(fleet_numbers) - {data.num for data in candidates})
+    if unknown:
+        print(f"❌ No seed data for fleet number(s): {', '.join(unknown)}")
+    if not candidates:
+        return
+
+    rows = [{
+        'vin': data.vin,
+        'make': data.make,
+        'model': data.model,
+        'year': data.year,
+        'license_plate': data.license,
+        'purchase_date': datetime(data.year, 1, 1).date(),
+        'current_mileage': data.miles,
+        'status': 'Active',
+        'assigned_driver': data.driver
+    } for data in candidates]
+
+    with app.app_context():
+        # One multi-row insert; existing VINs are skipped and only the inserted ones come back
+        restored_vins = set(db.session.scalars(
+            insert(Vehicle).values(rows).on_conflict_do_nothing(index_elements=['vin']).returning(Vehicle.vin)
+        ))
+        db.session.commit()
+
+    for vehicle in rows:
+        if vehicle['vin'] not in restored_vins:
+            print(f"✓ Vehicle already exists: {vehicle['year']} {vehicle['make']} {vehicle['model']}")
+            continue
+
+        print(f"✅ Restored: {vehicle['year']} {vehicle['make']} {vehicle['model']}")
+        print(f"   VIN: {vehicle['vin']}")
+        print(f"   License: {vehicle['license_plate']}")
+        print(f"   Driver: {vehicle['assigned_driver']}")
+        print(f"   Mileage: {vehicle['current_mileage']:,}")
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__.strip())
+        sys.exit(1)
+    restore_vehicles(sys.argv[1:])
@@ -0,0 +1,73 @@
+import os
+import sys
+import tempfile
+
+# Point the app at a throwaway database and an in-process cache before it is imported
+os.environ['FLEET_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+os.environ['CACHE_TYPE'] = 'SimpleCache'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app import app as flask_app, db, cache, User, Vehicle, MaintenanceRecord
+
+
+@pytest.fixture
+def app():
+    """App with an empty schema, a small fleet and one user"""
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        db.create_all()
+        user = User(username='tester', email='tester@example.com')
+        user.set_password('Password1')
+        db.session.add(user)
+        
+        today = date.today()
+        for n in range(5):
+            vehicle = Vehicle(vin=f'TESTVIN{n:010d}', make='Ford', model='Transit', year=2020,
+                              license_plate=f'TST{n}', purchase_date=today - timedelta(days=365))
+            vehicle.maintenance_records = [
+                MaintenanceRecord(maintenance_type='Oil Change', service_date=today - timedelta(days=30 * m),
+                                  mileage_at_service=1000 * m, cost=50.0, next_service_due=today + timedelta(days=m))
+                for m in range(3)
+            ]
+            db.session.add(vehicle)
+        db.session.commit()
+    
+    # Requests push their own app context, so each gets a fresh session like in production
+    yield flask_app
+    
+    with flask_app.app_context():
+        db.drop_all()
+        cache.clear()
+
+
+@pytest.fixture
+def client(app):
+    """Test client logged in as the fixture user"""
+    client = app.test_client()
+    client.post('/login', data={'username': 'tester', 'password': 'Password1'})
+    return client
+
+
+@pytest.fixture
+def count_queries(app):
+    """Call with a function; returns the number of SQL statements it executed"""
+    def count(fn):
+        statements = []
+        
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            fn()
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+        return len(statements)
+    return count
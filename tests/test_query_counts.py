@@ -0,0 +1,47 @@
+"""Guard the list views against N+1 queries by counting the SQL each page runs"""
+
+from app import db, Vehicle
+
+# Every logged-in page loads the user, and tagged pages read the fleet version for the ETag
+REQUEST_OVERHEAD = 2
+
+
+def get_page(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    return response
+
+
+def test_dashboard_queries(client, count_queries):
+    get_page(client, '/dashboard')  # Shows the login flash message and fills the stats cache
+    # Cached stats leave only the recent and upcoming maintenance lists
+    assert count_queries(lambda: get_page(client, '/dashboard')) <= 2 + REQUEST_OVERHEAD
+
+
+def test_dashboard_stats_recomputed_after_commit(app, client, count_queries):
+    get_page(client, '/dashboard')
+    cached = count_queries(lambda: get_page(client, '/dashboard'))
+    
+    with app.app_context():
+        db.session.get(Vehicle, 1).status = 'In Maintenance'
+        db.session.commit()
+    
+    # The commit cleared the cached stats, so they are queried once more
+    assert count_queries(lambda: get_page(client, '/dashboard')) == cached + 1
+    assert count_queries(lambda: get_page(client, '/dashboard')) == cached
+
+
+def test_dashboard_queries_without_cached_stats(client, count_queries):
+    get_page(client, '/vehicles')  # Shows the login flash message
+    assert count_queries(lambda: get_page(client, '/dashboard')) <= 3 + REQUEST_OVERHEAD
+
+
+def test_vehicles_queries(client, count_queries):
+    get_page(client, '/dashboard')
+    assert count_queries(lambda: get_page(client, '/vehicles')) <= 3 + REQUEST_OVERHEAD
+
+
+def test_vehicle_detail_queries(client, count_queries):
+    get_page(client, '/dashboard')
+    # The vehicle and its history come back in one joined query
+    assert count_queries(lambda: get_page(client, '/vehicle/1')) <= 1 + REQUEST_OVERHEAD
@@ -8,7 +8,9 @@ INSTRUCTIONS:
    cd fleet-manager
    mkvirtualenv --python=/usr/bin/python3.10 fleet-env
    pip install -r requirements.txt
+   echo "SECRET_KEY=$(python -c 'import secrets; print(secrets.token_hex(32))')" >> .env
    python migrate_security.py
+   python migrate_fleet.py
    python create_user.py
 
 3. Go to Web tab → Add new web app → Manual configuration → Python 3.10
@@ -27,9 +29,14 @@ project_path = '/home/YOUR_USERNAME/fleet-manager'
 if project_path not in sys.path:
     sys.path.insert(0, project_path)
 
-# Set production environment variables
-os.environ['SECRET_KEY'] = '0f2ed3ae5105f1cad555fb9b7f0d3743a7b0192f916d7231e00bfc97196ca8df'
-os.environ['FLASK_ENV'] = 'production'
+# Secrets live in the project's .env file, never in this file
+from dotenv import load_dotenv
+load_dotenv(os.path.join(project_path, '.env'))
+os.environ.setdefault('FLASK_ENV', 'production')
+
+# Every worker must sign sessions with the same key, so refuse to start without one
+if 'SECRET_KEY' not in os.environ:
+    raise RuntimeError(f"SECRET_KEY is not set - add it to {project_path}/.env")
 
 from app import app as application
 